@@ -0,0 +1,5 @@
+"""
+Benchmark scripts for the Social Insight Engine backend.
+
+Run from the backend directory, e.g. `python -m benchmarks.inference_benchmark`.
+"""
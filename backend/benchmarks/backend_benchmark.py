@@ -0,0 +1,74 @@
+"""
+Throughput and accuracy parity of the ONNX int8 backend against the torch pipeline.
+
+Usage:
+    python -m benchmarks.backend_benchmark --size 5000
+    python -m benchmarks.backend_benchmark --input comments.txt --min-agreement 0.98
+
+Labels from the torch pipeline are the reference. The run exits non-zero when
+the ONNX backend agrees on fewer than --min-agreement of the comments.
+"""
+import argparse
+import json
+import sys
+import time
+from benchmarks.corpus import synthetic_comments
+from services.onnx_backend import load_onnx_pipeline
+from services.sentiment_engine import MODEL_NAME, SentimentEngine, build_pipeline
+from utils import data_paths
+
+
+def _run(engine, comments):
+    engine.classify(comments[:32])
+    start = time.perf_counter()
+    results = engine.classify(comments)
+    elapsed = time.perf_counter() - start
+    return results, {"seconds": round(elapsed, 3), "comments_per_sec": round(len(comments) / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--input", help="file with one comment per line instead of the synthetic corpus")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads for both backends, 0 = default")
+    parser.add_argument("--min-agreement", type=float, default=0.97)
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            comments = [line.strip() for line in f if line.strip()]
+    else:
+        comments = synthetic_comments(args.size)
+
+    torch_engine = SentimentEngine(build_pipeline("torch", args.threads), batch_size=args.batch_size)
+    onnx_engine = SentimentEngine(
+        load_onnx_pipeline(MODEL_NAME, data_paths.get_onnx_model_dir(MODEL_NAME), args.threads),
+        batch_size=args.batch_size
+    )
+
+    torch_results, torch_timing = _run(torch_engine, comments)
+    onnx_results, onnx_timing = _run(onnx_engine, comments)
+
+    agree = [a["label"] == b["label"] for a, b in zip(torch_results, onnx_results)]
+    agreement = sum(agree) / len(comments)
+    score_drift = max(
+        (abs(a["score"] - b["score"]) for a, b, same in zip(torch_results, onnx_results, agree) if same), default=0.0
+    )
+    report = {
+        "size": len(comments),
+        "batch_size": args.batch_size,
+        "torch": torch_timing,
+        "onnx_int8": onnx_timing,
+        "speedup": round(torch_timing["seconds"] / onnx_timing["seconds"], 2),
+        "label_agreement": round(agreement, 4),
+        "max_score_drift": round(score_drift, 4),
+        "passed": agreement >= args.min_agreement,
+    }
+    print(json.dumps(report, indent=2))
+    if not report["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
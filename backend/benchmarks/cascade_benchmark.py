@@ -0,0 +1,110 @@
+"""
+Escalation rate, agreement and speed of the lexical cascade against transformer-only labelling.
+
+Usage:
+    python -m benchmarks.cascade_benchmark --size 20000
+    python -m benchmarks.cascade_benchmark --model real --size 5000 --save data/lexical_model.npz
+    python -m benchmarks.cascade_benchmark --input labelled.jsonl --thresholds 0.8 0.9 0.95
+
+The transformer's labels are the reference. Distinct comments are split into
+a training and a held-out set; the lexical model is trained on the first and,
+for every threshold, the held-out set reports the share escalated to the
+transformer and how often the cascade's final label matches transformer-only
+output. `--model fake` (the default) labels the synthetic corpus with the
+keyword stand-in so the run needs no torch. The run exits non-zero when no
+threshold reaches --min-agreement.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+import numpy as np
+from benchmarks.corpus import synthetic_comments
+from benchmarks.mock_services import MockSentimentPipeline
+from services.lexical_model import LexicalModel, _read_labelled
+from services.sentiment_engine import SentimentEngine, build_pipeline
+
+
+def _reference_labels(comments, model: str, batch_size: int):
+    pipeline = MockSentimentPipeline() if model == "fake" else build_pipeline("torch")
+    engine = SentimentEngine(pipeline, batch_size=batch_size)
+    start = time.perf_counter()
+    labels = [r["label"] for r in engine.classify(comments)]
+    return labels, (time.perf_counter() - start) / len(comments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--input", help="JSONL of transformer-labelled comments (`text`, `label`)")
+    parser.add_argument("--model", choices=["fake", "real"], default="fake")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.7, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--min-agreement", type=float, default=0.97)
+    parser.add_argument("--save", type=Path, help="also save the trained model here")
+    args = parser.parse_args()
+
+    transformer_seconds = None
+    if args.input:
+        texts, labels = _read_labelled(Path(args.input))
+    else:
+        texts = synthetic_comments(args.size, seed=7, multilingual=0.1)
+        labels, transformer_seconds = _reference_labels(texts, args.model, args.batch_size)
+    # Repeated comments would put the same text on both sides of the split
+    distinct = list(dict(zip(texts, labels)).items())
+    random.Random(0).shuffle(distinct)
+    cut = int(len(distinct) * (1 - args.holdout))
+    train, held_out = distinct[:cut], distinct[cut:]
+
+    start = time.perf_counter()
+    model = LexicalModel.train([t for t, _ in train], [label for _, label in train], epochs=args.epochs)
+    train_seconds = time.perf_counter() - start
+    if args.save:
+        model.save(args.save)
+
+    test_texts = [t for t, _ in held_out]
+    reference = np.array([label for _, label in held_out])
+    start = time.perf_counter()
+    results, confidence = model.predict(test_texts)
+    lexical_seconds = (time.perf_counter() - start) / len(test_texts)
+    predicted = np.array([r["label"] for r in results])
+
+    sweep = []
+    for threshold in args.thresholds:
+        escalated = confidence < threshold
+        # Escalated comments get the transformer's label, so they always agree
+        agreement = float(np.mean(escalated | (predicted == reference)))
+        row = {
+            "threshold": threshold,
+            "escalation_rate": round(float(escalated.mean()), 4),
+            "agreement": round(agreement, 4),
+        }
+        if transformer_seconds:
+            cascade = lexical_seconds + escalated.mean() * transformer_seconds
+            row["speedup"] = round(transformer_seconds / cascade, 2)
+        sweep.append(row)
+
+    passing = [row for row in sweep if row["agreement"] >= args.min_agreement]
+    report = {
+        "benchmark": "cascade",
+        "train_size": len(train),
+        "held_out_size": len(held_out),
+        "reference": "input file" if args.input else args.model,
+        "train_seconds": round(train_seconds, 2),
+        "lexical_ms_per_comment": round(lexical_seconds * 1000, 4),
+        "transformer_ms_per_comment": round(transformer_seconds * 1000, 4) if transformer_seconds else None,
+        "lexical_only_agreement": round(float(np.mean(predicted == reference)), 4),
+        "thresholds": sweep,
+        "recommended_threshold": min(passing, key=lambda row: row["escalation_rate"])["threshold"] if passing else None,
+    }
+    print(json.dumps(report, indent=2))
+    if not passing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Synthetic comment corpora for benchmarks."""
+import random
+from typing import List
+
+_WORDS = [
+    "great", "service", "love", "this", "product", "delivery", "was", "late", "again",
+    "price", "too", "high", "amazing", "quality", "worst", "support", "ever", "thanks",
+    "team", "when", "restock", "please", "reply", "inbox", "size", "color", "nice",
+    "not", "happy", "with", "order", "refund", "fast", "shipping", "recommend", "friends",
+]
+_EMOJIS = ["🔥", "❤️", "😍", "👍", "😡", "😂", "🙏", "👎", "💯", "😢"]
+_MULTILINGUAL = [
+    "me encanta este producto", "el envío tardó demasiado", "très bon service, merci",
+    "livraison en retard encore", "bahut accha laga", "यह बहुत अच्छा है", "خدمة سيئة جدا",
+    "adorei a qualidade", "pengiriman cepat sekali", "とても良い商品です", "配送が遅すぎる",
+]
+_SPAM = [
+    "Tag 3 friends to win! 🎁", "Check my profile for free followers!!!", "Done ✅ @friend",
+    "First!!", "Inbox me for price", "Interested",
+]
+
+
+def synthetic_comments(size: int, seed: int = 42, multilingual: float = 0.0, duplicates: float = 0.0) -> List[str]:
+    """
+    Comments with a social-media-like length mix: mostly short, a long tail.
+    
+    `multilingual` is the share of non-English comments; `duplicates` the
+    share that repeat giveaway spam or an earlier comment verbatim.
+    """
+    rng = random.Random(seed)
+    comments = []
+    for _ in range(size):
+        # Extra draws only when enabled, so the default corpus stays identical across versions
+        if duplicates and comments and rng.random() < duplicates:
+            comments.append(rng.choice(_SPAM) if rng.random() < 0.7 else rng.choice(comments))
+            continue
+        if multilingual and rng.random() < multilingual:
+            comments.append(" ".join(rng.choices(_MULTILINGUAL, k=rng.randint(1, 3))))
+            continue
+        roll = rng.random()
+        if roll < 0.15:
+            comment = "".join(rng.choices(_EMOJIS, k=rng.randint(1, 4)))
+        elif roll < 0.75:
+            comment = " ".join(rng.choices(_WORDS, k=rng.randint(2, 12)))
+        elif roll < 0.97:
+            comment = " ".join(rng.choices(_WORDS, k=rng.randint(15, 60)))
+        else:
+            # Longer than the model's max length; exercises truncation
+            comment = " ".join(rng.choices(_WORDS, k=rng.randint(200, 400)))
+        if rng.random() < 0.3:
+            comment += " " + rng.choice(_EMOJIS)
+        comments.append(comment)
+    return comments
@@ -0,0 +1,48 @@
+"""
+Throughput of the batched sentiment engine on a synthetic corpus.
+
+Usage:
+    python -m benchmarks.inference_benchmark --size 10000 --batch-sizes 8 32 64
+    python -m benchmarks.inference_benchmark --baseline   # also time the unbatched pipeline call
+"""
+import argparse
+import json
+import time
+from benchmarks.corpus import synthetic_comments
+from controllers.classify import get_sentiment_pipeline
+from services.sentiment_engine import SentimentEngine
+
+
+def _throughput(fn, comments):
+    start = time.perf_counter()
+    fn(comments)
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 3), "comments_per_sec": round(len(comments) / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--baseline", action="store_true", help="time the original unbatched call")
+    args = parser.parse_args()
+
+    comments = synthetic_comments(args.size)
+    pipeline = get_sentiment_pipeline()
+    # Warm up so model initialisation is not counted
+    pipeline(comments[:8], truncation=True)
+
+    report = {"size": args.size, "results": {}}
+    if args.baseline:
+        report["results"]["unbatched"] = _throughput(
+            lambda texts: pipeline(texts, truncation=True), comments
+        )
+    for batch_size in args.batch_sizes:
+        engine = SentimentEngine(pipeline, batch_size=batch_size)
+        report["results"][f"bucketed_bs{batch_size}"] = _throughput(engine.classify, comments)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Local stand-ins for the Graph API, Gemini and the sentiment model.
+
+Nothing here imports the application, so the mock Graph server can be started
+before `utils` reads FB_GRAPH_URL.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S+0000"
+
+
+def _graph_comment(post_id: str, index: int, message: str, created: Optional[datetime] = None) -> dict:
+    created = created or _EPOCH + timedelta(seconds=index)
+    return {
+        "id": f"{post_id}_{index}",
+        "message": message,
+        "created_time": created.strftime(_TIME_FORMAT),
+        "like_count": index % 7,
+    }
+
+
+class MockGraphAPI:
+    """
+    Threaded HTTP server answering the Graph calls FacebookService makes.
+
+    Serves `/{version}/{page}_{post}/comments` with cursor paging,
+    `reverse_chronological` order and `since`, `/{version}/{page}/posts`
+    (with the comments field expansion and ETag / If-None-Match) and batch
+    POSTs. `latency_ms` is added to every response to model the network
+    round trip, and `throttle` makes the next requests answer 429.
+    """
+
+    def __init__(self, page_id: str, comments_by_post: Dict[str, List[str]], latency_ms: float = 0):
+        self.page_id = page_id
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self._throttled = 0
+        self._retry_after = "0"
+        self._posts = {
+            post_id: [_graph_comment(post_id, i, message) for i, message in enumerate(messages)]
+            for post_id, messages in comments_by_post.items()
+        }
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "MockGraphAPI":
+        threading.Thread(target=self._server.serve_forever, name="mock-graph", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+
+    def add_comments(self, post_id: str, count: int, created_time: Optional[datetime] = None) -> List[str]:
+        """
+        Append `count` comments to a post, one second apart, and return their ids.
+
+        They start at `created_time` (UTC), by default one second after the
+        post's newest comment, so they are newer than any stored watermark.
+        """
+        comments = self._posts.setdefault(post_id, [])
+        if created_time is None:
+            newest = max((datetime.strptime(c["created_time"], _TIME_FORMAT) for c in comments), default=None)
+            created_time = (newest.replace(tzinfo=timezone.utc) + timedelta(seconds=1)) if newest else _EPOCH
+        start = len(comments)
+        added = [
+            _graph_comment(post_id, start + i, f"New comment {start + i}", created_time + timedelta(seconds=i))
+            for i in range(count)
+        ]
+        comments.extend(added)
+        return [c["id"] for c in added]
+
+    def throttle(self, count: int, retry_after: float = 0) -> None:
+        """Answer the next `count` requests with 429 and a Retry-After header."""
+        self._throttled = count
+        self._retry_after = str(retry_after)
+
+    def _comments_page(self, path: str, query: Dict[str, List[str]]) -> dict:
+        object_id = path.strip("/").split("/")[-2]
+        post_id = object_id.split("_", 1)[-1]
+        comments = self._posts.get(post_id, [])
+        if query.get("order", [""])[0] == "reverse_chronological":
+            comments = comments[::-1]
+        if "since" in query:
+            since = datetime.fromtimestamp(int(query["since"][0]), tz=timezone.utc)
+            comments = [c for c in comments if c["created_time"] > since.strftime(_TIME_FORMAT)]
+
+        after = int(query.get("after", ["0"])[0])
+        limit = int(query.get("limit", ["25"])[0])
+        page = {"data": comments[after:after + limit], "paging": {"cursors": {"after": str(after + limit)}}}
+        if after + limit < len(comments):
+            params = {k: v[0] for k, v in query.items()}
+            params["after"] = str(after + limit)
+            page["paging"]["next"] = f"{self.url}{path}?{urlencode(params)}"
+        return page
+
+    def _posts_page(self, query: Dict[str, List[str]]) -> dict:
+        fields = query.get("fields", [""])[0]
+        after = int(query.get("after", ["0"])[0])
+        limit = int(query.get("limit", ["25"])[0])
+        posts = []
+        for post_id in list(self._posts)[after:after + limit]:
+            post = {"id": f"{self.page_id}_{post_id}", "message": f"Post {post_id}",
+                    "created_time": _EPOCH.strftime(_TIME_FORMAT), "permalink_url": ""}
+            if "comments.limit(" in fields:
+                comment_limit = fields.split("comments.limit(")[1].split(")")[0]
+                post["comments"] = self._comments_page(
+                    f"/v/{self.page_id}_{post_id}/comments", {"limit": [comment_limit]}
+                )
+            posts.append(post)
+        paging = {"cursors": {"before": str(after), "after": str(after + limit)}}
+        if after + limit < len(self._posts):
+            params = {k: v[0] for k, v in query.items()}
+            params["after"] = str(after + limit)
+            paging["next"] = f"{self.url}/v/{self.page_id}/posts?{urlencode(params)}"
+        return {"data": posts, "paging": paging}
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, etag: bool = False) -> None:
+                api.requests += 1
+                if api.latency:
+                    time.sleep(api.latency)
+                if api._throttled > 0:
+                    api._throttled -= 1
+                    body = json.dumps({"error": {"code": 4, "message": "Application request limit reached"}})
+                    self.send_response(429)
+                    self.send_header("Retry-After", api._retry_after)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body.encode("utf-8"))
+                    return
+                body = json.dumps(payload).encode("utf-8")
+                tag = f'"{hashlib.md5(body).hexdigest()}"' if etag else None
+                if tag and self.headers.get("If-None-Match") == tag:
+                    self.send_response(304)
+                    self.send_header("ETag", tag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if tag:
+                    self.send_header("ETag", tag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                if parsed.path.endswith("/comments"):
+                    self._send(api._comments_page(parsed.path, query))
+                elif parsed.path.endswith("/posts"):
+                    self._send(api._posts_page(query), etag=True)
+                else:
+                    self._send({"data": []})
+
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+                responses = []
+                for request in json.loads(form["batch"][0]):
+                    path, _, query = request["relative_url"].partition("?")
+                    page = api._comments_page(f"/v/{path}", parse_qs(query))
+                    responses.append({"code": 200, "body": json.dumps(page)})
+                self._send(responses)
+
+        return Handler
+
+
+class MockGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class MockGemini:
+    """Gemini stand-in: fixed latency per call plus time per prompt token."""
+
+    def __init__(self, latency_ms: float = 300, ms_per_1k_tokens: float = 20):
+        self.latency = latency_ms / 1000
+        self.per_token = ms_per_1k_tokens / 1000 / 1000
+        self.calls = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str) -> MockGeminiResponse:
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+        time.sleep(self.latency + self.per_token * len(prompt) / 4)
+        if "[POSITIVE_START]" in prompt:
+            section = "KEY TAKEAWAYS\n* **Theme**: Description\nACTIONABLE IMPROVEMENTS\n* **Fix**: Description"
+            return MockGeminiResponse(
+                f"[POSITIVE_START]\n{section}\n[POSITIVE_END]\n[NEGATIVE_START]\n{section}\n[NEGATIVE_END]"
+            )
+        return MockGeminiResponse("\n".join(f"- Theme {i} (~{10 - i})" for i in range(5)))
+
+
+class MockSentimentPipeline:
+    """
+    Transformers-pipeline stand-in with a cost model: fixed time per call
+    plus time per comment, and keyword labels.
+    """
+
+    def __init__(self, ms_per_call: float = 5, ms_per_comment: float = 1):
+        self.per_call = ms_per_call / 1000
+        self.per_comment = ms_per_comment / 1000
+
+    def __call__(self, texts: List[str], **kwargs) -> List[dict]:
+        time.sleep(self.per_call + self.per_comment * len(texts))
+        results = []
+        for text in texts:
+            lowered = text.lower()
+            if any(word in lowered for word in ("love", "great", "amazing", "❤", "😍")):
+                label = "POS"
+            elif any(word in lowered for word in ("worst", "late", "refund", "😡", "👎")):
+                label = "NEG"
+            else:
+                label = "NEU"
+            results.append({"label": label, "score": 0.9})
+        return results
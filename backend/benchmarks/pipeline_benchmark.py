@@ -0,0 +1,191 @@
+"""
+Per-stage latency, throughput and peak RSS of the comment pipeline.
+
+Usage:
+    python -m benchmarks.pipeline_benchmark --sizes 100 1000 10000 100000 --repeat 3 --output bench.json
+    python -m benchmarks.pipeline_benchmark --model real --sizes 1000
+
+Stages, each timed separately for every corpus size:
+    fetch      scrape a post's comments from a local mock Graph API into the store
+    load       read the stored comments back and build the DataFrame
+    export     write the Excel export (skip with --skip-export)
+    classify   label every comment (dedup + model; caches are disabled)
+    takeaways  sample, map-reduce and prompt a mock Gemini
+
+Everything runs against a temporary DATA_DIR with the sentiment and
+takeaway caches disabled, so every repeat is cold. `--model fake` (the
+default) replaces the transformer with a cost model so the harness runs
+without torch. The JSON report carries the run's settings and environment so
+runs can be compared with each other.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+import numpy as np
+from benchmarks.corpus import synthetic_comments
+from benchmarks.mock_services import MockGemini, MockGraphAPI, MockSentimentPipeline
+
+PAGE_ID = "benchpage"
+STAGES = ("fetch", "load", "export", "classify", "takeaways")
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is the process-wide peak: kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """Samples resident memory in the background while a stage runs."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self) -> "PeakRSS":
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+
+def _summarise(seconds: List[float], items: int, peaks: List[int]) -> Dict[str, float]:
+    ms = np.array(seconds) * 1000
+    return {
+        "runs": len(seconds),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p90_ms": round(float(np.percentile(ms, 90)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "items_per_sec": round(items / float(np.median(seconds)), 1) if np.median(seconds) > 0 else None,
+        "peak_rss_mb": round(max(peaks) / 2**20, 1),
+    }
+
+
+def _configure_environment(graph_url: str, data_dir: str, model: str) -> None:
+    """Must run before any application module is imported: Config reads the environment once."""
+    os.environ.update({
+        "FB_GRAPH_URL": graph_url,
+        "DATA_DIR": data_dir,
+        "MAX_COMMENTS": "0",
+        "SENTIMENT_CACHE_SIZE": "0",
+        "SENTIMENT_CACHE_PERSIST": "false",
+        "TAKEAWAY_CACHE_SIZE": "0",
+        "TAKEAWAY_CACHE_PERSIST": "false",
+    })
+    if model == "fake":
+        os.environ["INFERENCE_WORKERS"] = "0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--model", choices=["fake", "real"], default="fake")
+    parser.add_argument("--multilingual", type=float, default=0.1, help="share of non-English comments")
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of spam / repeated comments")
+    parser.add_argument("--graph-latency-ms", type=float, default=20)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--skip-export", action="store_true", help="skip the Excel export stage")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    corpora = {
+        f"post{size}": synthetic_comments(size, seed=size, multilingual=args.multilingual, duplicates=args.duplicates)
+        for size in args.sizes
+    }
+    graph = MockGraphAPI(PAGE_ID, corpora, latency_ms=args.graph_latency_ms).start()
+    data_dir = tempfile.mkdtemp(prefix="sie-bench-")
+    _configure_environment(graph.url, data_dir, args.model)
+
+    from controllers import classify
+    from services.comment_store import comment_store
+    from services.facebook_service import FacebookService
+
+    if args.model == "fake":
+        # Installed before first use, so get_sentiment_engine() wraps the stand-in
+        classify._sentiment_pipeline = MockSentimentPipeline()
+    classify.get_sentiment_engine()
+    gemini = MockGemini(latency_ms=args.gemini_latency_ms)
+    service = FacebookService(PAGE_ID, "benchmark-token")
+
+    stages = {
+        "fetch": lambda post_id: service.scrape_comments(post_id),
+        "load": lambda post_id: len(classify.load_comment_list(comment_store.load_records(post_id))),
+        "export": lambda post_id: comment_store.export_to_excel(post_id),
+        "classify": lambda post_id: classify.analyze_post_sentiment(post_id)["total"],
+        "takeaways": lambda post_id: classify.add_takeaways(
+            classify._build_result(comment_store.get_counts(post_id), comment_store.load_grouped(post_id)),
+            post_id=post_id, model=gemini
+        ),
+    }
+    if args.skip_export:
+        del stages["export"]
+
+    results = []
+    try:
+        for size in args.sizes:
+            post_id = f"post{size}"
+            timings = {name: [] for name in stages}
+            peaks = {name: [] for name in stages}
+            for _ in range(args.repeat):
+                for name, run in stages.items():
+                    with PeakRSS() as rss:
+                        start = time.perf_counter()
+                        run(post_id)
+                        timings[name].append(time.perf_counter() - start)
+                    peaks[name].append(rss.peak)
+            results.append({
+                "size": size,
+                "stages": {name: _summarise(timings[name], size, peaks[name]) for name in stages},
+            })
+            print(f"size {size}: " + ", ".join(
+                f"{name} p50 {stats['p50_ms']}ms" for name, stats in results[-1]["stages"].items()
+            ), file=sys.stderr)
+    finally:
+        graph.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "benchmark": "pipeline",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": vars(args),
+        "external_calls": {"graph_requests": graph.requests, "gemini_calls": gemini.calls},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Cold-boot time and baseline memory of the API for endpoints that need no ML.
+
+Usage:
+    python -m benchmarks.startup_benchmark --runs 5 --max-boot-seconds 2 --max-rss-mb 150
+
+Each run starts a fresh interpreter that imports `main`, runs the app's
+startup and serves one `/posts` call against a local mock Graph API. It
+reports import time, time to the first response and peak RSS. The run
+fails if a threshold is exceeded or any heavy module (torch, transformers,
+pandas, ...) was loaded along the way.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.mock_services import MockGraphAPI
+
+HEAVY_MODULES = ["torch", "transformers", "pandas", "numpy", "onnxruntime", "google.genai", "openpyxl"]
+
+_CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    response = client.get("/posts", params={"limit": 5})
+first_response = time.perf_counter() - start
+print(json.dumps({
+    "import_seconds": imported,
+    "first_response_seconds": first_response,
+    "status": response.status_code,
+    "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+""" % HEAVY_MODULES
+
+
+def _boot_once(env: dict) -> dict:
+    backend_dir = Path(__file__).resolve().parent.parent
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD], cwd=backend_dir, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    # Includes interpreter start-up, which is what a uvicorn worker (re)start pays
+    result["boot_seconds"] = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-boot-seconds", type=float, default=2.0)
+    parser.add_argument("--max-rss-mb", type=float, default=150)
+    args = parser.parse_args()
+
+    graph = MockGraphAPI("benchpage", {"post1": ["hello"]}).start()
+    with tempfile.TemporaryDirectory(prefix="sie-startup-") as data_dir:
+        env = dict(os.environ, FB_GRAPH_URL=graph.url, DATA_DIR=data_dir, PRELOAD_MODEL="false",
+                   FB_PAGE_ID="benchpage", FB_ACCESS_TOKEN="benchmark-token")
+        runs = [_boot_once(env) for _ in range(args.runs)]
+    graph.stop()
+
+    boot = statistics.median(r["boot_seconds"] for r in runs)
+    rss_mb = max(r["peak_rss_kb"] for r in runs) / (1024 if sys.platform != "darwin" else 1024 * 1024)
+    heavy = sorted({m for r in runs for m in r["heavy_modules"]})
+    report = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "median_boot_seconds": round(boot, 3),
+        "median_import_seconds": round(statistics.median(r["import_seconds"] for r in runs), 3),
+        "median_first_response_seconds": round(statistics.median(r["first_response_seconds"] for r in runs), 3),
+        "peak_rss_mb": round(rss_mb, 1),
+        "posts_status": runs[-1]["status"],
+        "heavy_modules_loaded": heavy,
+    }
+    failures = []
+    if boot > args.max_boot_seconds:
+        failures.append(f"boot {boot:.2f}s > {args.max_boot_seconds}s")
+    if rss_mb > args.max_rss_mb:
+        failures.append(f"RSS {rss_mb:.0f}MB > {args.max_rss_mb}MB")
+    if heavy:
+        failures.append(f"heavy modules loaded: {', '.join(heavy)}")
+    if report["posts_status"] != 200:
+        failures.append(f"/posts returned {report['posts_status']}")
+    report["passed"] = not failures
+    report["failures"] = failures
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Offline bulk sentiment labelling for exported comments.
+
+Usage:
+    python bulk_classify.py comments.csv --output labelled.jsonl
+    python bulk_classify.py export.parquet --output labelled.csv --text-column message --workers 4
+
+The input (CSV, JSONL or Parquet) is streamed in `--chunk-size` rows and
+each chunk is labelled by `label_comments` in a worker process, so caching,
+deduplication and the cascade behave exactly as in the API. Rows are written
+in input order with a `sentiment` column added (JSONL or CSV, chosen by the
+output extension), and a checkpoint next to the output records how far the
+run got. Re-running the same command resumes after the last written chunk;
+once the run is complete it does nothing. Only the chunks in flight are held in memory, whatever the input size.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Exported comments can exceed the csv module's default 128 KB field limit
+csv.field_size_limit(2 ** 31 - 1)
+TEXT_COLUMNS = ("Comments", "message", "text")
+
+
+def _read_rows(path: Path, batch_size: int) -> Iterator[Dict[str, Any]]:
+    """Rows of a CSV, JSONL or Parquet file as dicts, read lazily."""
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise SystemExit("Parquet input needs pyarrow (pip install pyarrow)") from e
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    else:
+        raise SystemExit(f"Unsupported input format: {path.suffix} (expected .csv, .jsonl or .parquet)")
+
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class LabelledWriter:
+    """Appends labelled rows as JSONL or CSV; `size()` is the flushed byte length used for checkpoints."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.is_csv = path.suffix.lower() == ".csv"
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._csv = None
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        if not self.is_csv:
+            self._file.writelines(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+            return
+        if self._csv is None:
+            fieldnames = list(rows[0])
+            self._csv = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+            if self.size() == 0:
+                self._csv.writeheader()
+        self._csv.writerows(rows)
+
+    def size(self) -> int:
+        self._file.flush()
+        return os.fstat(self._file.fileno()).st_size
+
+    def sync(self) -> int:
+        size = self.size()
+        os.fsync(self._file.fileno())
+        return size
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Checkpoint:
+    """
+    Progress of a run, stored as JSON next to the output.
+
+    It is rewritten atomically after each chunk's rows are synced, so after a
+    crash the output is cut back to `output_bytes` and the input resumes at
+    `rows_done`. The input fingerprint stops a resume against a changed file.
+    """
+
+    def __init__(self, path: Path, fingerprint: Dict[str, Any]):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.rows_done = 0
+        self.output_bytes = 0
+        self.complete = False
+
+    def load(self) -> bool:
+        """Restore progress from disk; False when there is nothing to resume."""
+        if not self.path.exists():
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["fingerprint"] != self.fingerprint:
+            raise SystemExit(
+                f"{self.path} belongs to a different input or settings; delete it or pass --restart"
+            )
+        self.rows_done = saved["rows_done"]
+        self.output_bytes = saved["output_bytes"]
+        self.complete = saved.get("complete", False)
+        return True
+
+    def save(self, rows_done: int, output_bytes: int, complete: bool = False) -> None:
+        self.rows_done, self.output_bytes, self.complete = rows_done, output_bytes, complete
+        state = {"fingerprint": self.fingerprint, "rows_done": rows_done, "output_bytes": output_bytes,
+                 "complete": complete}
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def _init_worker(threads: int) -> None:
+    """Runs in each fresh worker before the application is imported, since Config reads the environment once."""
+    # Nested inference pools would multiply model copies; each bulk worker classifies in-process
+    os.environ["INFERENCE_WORKERS"] = "0"
+    os.environ["INFERENCE_BATCH_WINDOW_MS"] = "0"
+    if threads:
+        os.environ.setdefault("INFERENCE_THREADS", str(threads))
+
+
+def _label_chunk(texts: List[str]) -> List[str]:
+    from controllers.classify import label_comments
+    return label_comments(texts)
+
+
+def _text_of(row: Dict[str, Any], column: str) -> str:
+    value = row.get(column)
+    return "" if value is None else str(value)
+
+
+def _detect_text_column(first_row: Dict[str, Any]) -> str:
+    for column in TEXT_COLUMNS:
+        if column in first_row:
+            return column
+    raise SystemExit(f"No comment text column found (tried {', '.join(TEXT_COLUMNS)}); pass --text-column")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path)
+    parser.add_argument("--output", type=Path, required=True, help=".jsonl or .csv")
+    parser.add_argument("--text-column", help=f"column holding the comment text (default: first of {TEXT_COLUMNS})")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=2,
+                        help="processes that each load the model; 0 classifies in this process")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    stat = args.input.stat()
+    fingerprint = {
+        "input": str(args.input.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+        "text_column": args.text_column,
+    }
+    checkpoint = Checkpoint(args.output.with_name(args.output.name + ".checkpoint"), fingerprint)
+    if args.restart or not checkpoint.load():
+        args.output.unlink(missing_ok=True)
+    elif checkpoint.complete:
+        print(f"{args.output} is already complete ({checkpoint.rows_done} rows); pass --restart to redo it",
+              file=sys.stderr)
+        return
+    elif args.output.exists():
+        # Rows written after the last checkpoint are written again
+        with open(args.output, "r+b") as f:
+            f.truncate(checkpoint.output_bytes)
+
+    rows = _read_rows(args.input, args.chunk_size)
+    skipped = sum(1 for _ in islice(rows, checkpoint.rows_done))
+    if skipped:
+        print(f"Resuming after {skipped} rows", file=sys.stderr)
+
+    threads = max(1, (os.cpu_count() or 1) // args.workers) if args.workers else 0
+    executor = ProcessPoolExecutor(
+        max_workers=args.workers, mp_context=get_context("spawn"), initializer=_init_worker, initargs=(threads,)
+    ) if args.workers else None
+    writer = LabelledWriter(args.output)
+    text_column = args.text_column
+    rows_done, start = checkpoint.rows_done, time.perf_counter()
+
+    # At most two chunks per worker are in flight, which keeps memory flat
+    in_flight: List[Tuple[List[Dict[str, Any]], Any]] = []
+    window = max(1, args.workers * 2)
+
+    def drain_one() -> None:
+        nonlocal rows_done
+        chunk, future = in_flight.pop(0)
+        labels = future.result() if executor else future
+        for row, label in zip(chunk, labels):
+            row["sentiment"] = label
+        writer.write(chunk)
+        rows_done += len(chunk)
+        checkpoint.save(rows_done, writer.sync())
+        elapsed = time.perf_counter() - start
+        print(f"{rows_done} rows labelled ({(rows_done - skipped) / elapsed:.0f} rows/s)", file=sys.stderr)
+
+    try:
+        for chunk in _chunks(rows, args.chunk_size):
+            text_column = text_column or _detect_text_column(chunk[0])
+            texts = [_text_of(row, text_column) for row in chunk]
+            if executor:
+                in_flight.append((chunk, executor.submit(_label_chunk, texts)))
+            else:
+                in_flight.append((chunk, _label_chunk(texts)))
+            if len(in_flight) >= window:
+                drain_one()
+        while in_flight:
+            drain_one()
+    finally:
+        writer.close()
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    checkpoint.save(rows_done, checkpoint.output_bytes, complete=True)
+    print(f"Done: {rows_done} rows in {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,251 @@
 from collections import defaultdict
+from functools import partial
 import os
-import pandas as pd
-from transformers import pipeline
+import random
+import threading
+import time
+from typing import Optional
+from services.comment_store import comment_store
+from services.inference_pool import InferencePool
+from services.metrics import CACHE_EVENTS, CASCADE_AUDITS, COMMENTS_PROCESSED, timed
+from services.micro_batcher import MicroBatcher
+from services.sentiment_cache import sentiment_cache
+from services.sentiment_engine import MODEL_NAME, SentimentEngine, build_pipeline, model_tag
 from services.takeaway_generation import extract_combined_takeaways
-from utils import DataFrameOperations, data_paths
+from utils import config, logger, ErrorHandler
+
+LABEL_MAP = {"POS": "positive", "NEG": "negative", "NEU": "neutral"}
+WARM_UP_COMMENTS = ["Love this! ❤️", "Worst service ever.", "ok"]
+MODEL_TAG = model_tag(config.sentiment_backend)
 
 _sentiment_pipeline = None
+_sentiment_engine = None
+_lexical_model = None
+_lexical_failed = False
+_model_lock = threading.Lock()
+# "lazy" until the first classification loads the model when PRELOAD_MODEL is off
+_model_state = {
+    "status": "not_loaded" if config.preload_model else "lazy", "model": MODEL_NAME, "backend": config.sentiment_backend, "load_seconds": None, "error": None
+}
 
 def get_sentiment_pipeline():
+    """Build the sentiment pipeline once; concurrent first callers wait for it."""
     global _sentiment_pipeline
     if _sentiment_pipeline is None:
-        _sentiment_pipeline = pipeline("sentiment-analysis", model="finiteautomata/bertweet-base-sentiment-analysis")
+        with _model_lock:
+            if _sentiment_pipeline is None:
+                _model_state.update(status="loading", error=None)
+                start = time.perf_counter()
+                try:
+                    _sentiment_pipeline = build_pipeline(config.sentiment_backend, config.inference_threads)
+                except Exception as e:
+                    _model_state.update(status="failed", error=str(e))
+                    raise
+                _model_state.update(status="loaded", load_seconds=round(time.perf_counter() - start, 2))
     return _sentiment_pipeline
 
-def classify_comments(gemini_api_key: str = None, comments_data: list[dict] = None):
+def get_sentiment_engine():
     """
-    Classify comments for sentiment analysis.
+    The shared inference engine, warmed up with a dummy batch on creation.
     
-    Args:
-        gemini_api_key: API key for Gemini insights
-        comments_data: Optional list of comment dictionaries in-memory. 
-                      If None, reads from Excel file (backward compatibility).
+    With INFERENCE_WORKERS set this is an InferencePool whose worker
+    processes each load the model; otherwise an in-process SentimentEngine,
+    behind a MicroBatcher that merges concurrent callers' comments into
+    shared batches. All expose the same `classify(texts)`.
     """
-    sentiment_pipeline = get_sentiment_pipeline()
+    global _sentiment_engine
+    if _sentiment_engine is None:
+        if config.inference_workers > 0:
+            with _model_lock:
+                if _sentiment_engine is None:
+                    _sentiment_engine = _start_inference_pool()
+                    _model_state["status"] = "ready"
+            return _sentiment_engine
 
-    if comments_data is not None:
+        pipeline_ = get_sentiment_pipeline()
+        with _model_lock:
+            if _sentiment_engine is None:
+                engine = SentimentEngine(pipeline_)
+                engine.classify(WARM_UP_COMMENTS)
+                if config.inference_batch_window_ms > 0:
+                    engine = MicroBatcher(engine.classify, config.inference_batch_window_ms, config.inference_max_batch)
+                _sentiment_engine = engine
+                _model_state["status"] = "ready"
+    return _sentiment_engine
+
+def _start_inference_pool() -> InferencePool:
+    threads = config.inference_worker_threads or max(1, (os.cpu_count() or 1) // config.inference_workers)
+    pool = InferencePool(
+        partial(build_pipeline, config.sentiment_backend, threads),
+        workers=config.inference_workers,
+        engine_options={"batch_size": config.sentiment_batch_size, "max_length": config.sentiment_max_length},
+        warm_up=WARM_UP_COMMENTS,
+        batch_window_ms=config.inference_batch_window_ms,
+        max_batch=config.inference_max_batch,
+    )
+    _model_state.update(status="loading", error=None)
+    start = time.perf_counter()
+    try:
+        pool.start()
+    except Exception as e:
+        _model_state.update(status="failed", error=str(e))
+        raise
+    _model_state["load_seconds"] = round(time.perf_counter() - start, 2)
+    return pool
+
+def shutdown_sentiment_engine() -> None:
+    """Stop inference worker processes, if any were started."""
+    if isinstance(_sentiment_engine, InferencePool):
+        _sentiment_engine.stop()
+
+def get_lexical_model():
+    """The cascade's first tier, or None when CASCADE_MODEL is unset or cannot be loaded."""
+    global _lexical_model, _lexical_failed
+    if _lexical_model is None and config.cascade_model and not _lexical_failed:
+        with _model_lock:
+            if _lexical_model is None and not _lexical_failed:
+                from services.lexical_model import LexicalModel
+                try:
+                    _lexical_model = LexicalModel.load(config.cascade_model)
+                    logger.info(f"Cascade enabled with {config.cascade_model} (threshold {config.cascade_threshold})")
+                except (OSError, KeyError, ValueError) as e:
+                    # Fall back to the transformer for everything rather than failing requests
+                    _lexical_failed = True
+                    ErrorHandler.handle_file_error(e, "get_lexical_model")
+    return _lexical_model
+
+def get_batching_stats() -> Optional[dict]:
+    """Request-coalescing counters of the in-process MicroBatcher, or None when it is not in use."""
+    engine = _sentiment_engine
+    return engine.stats() if isinstance(engine, MicroBatcher) else None
+
+def get_model_state() -> dict:
+    return dict(_model_state)
+
+def warm_up_sentiment_model() -> None:
+    """Load the model and run a dummy batch so the first request pays nothing."""
+    try:
+        get_sentiment_engine()
+        logger.info(f"Sentiment model ready (loaded in {_model_state['load_seconds']}s)")
+    except Exception as e:
+        _model_state.update(status="failed", error=str(e))
+        logger.error(f"Sentiment model warm-up failed: {e}", exc_info=True)
+
+def label_comments(comment_list: list[str]) -> list[str]:
+    """
+    Sentiment label (positive/neutral/negative) for each comment, in order.
+    
+    Cached results are reused; only unseen texts reach the model. Near-duplicate
+    texts (spam, copypasta) are grouped and only one representative per group
+    is classified, its label standing for every member. Representatives go
+    through the lexical cascade tier first when one is configured.
+    """
+    with timed("cache_lookup"):
+        results = sentiment_cache.lookup(comment_list, MODEL_TAG)
+    pending = {}
+    for i, result in enumerate(results):
+        if result is None:
+            pending.setdefault(comment_list[i], []).append(i)
+    missed = sum(len(indices) for indices in pending.values())
+    CACHE_EVENTS.labels("sentiment", "hit").inc(len(comment_list) - missed)
+    CACHE_EVENTS.labels("sentiment", "miss").inc(missed)
+    COMMENTS_PROCESSED.labels("labelled").inc(len(comment_list))
+
+    if pending:
+        from services.dedup import dedup_stats, near_duplicates
+        texts = list(pending)
+        with timed("dedup"):
+            if config.dedup_threshold > 0:
+                owners = near_duplicates.group(texts, config.dedup_min_chars)
+            else:
+                owners = list(range(len(texts)))
+        representatives = sorted(set(owners))
+        rep_texts = [texts[r] for r in representatives]
+        fresh = _classify_uncached(rep_texts)
+
+        by_representative = dict(zip(representatives, fresh))
+        for text, owner in zip(texts, owners):
+            for i in pending[text]:
+                results[i] = by_representative[owner]
+
+        dedup_stats.record(missed, len(representatives))
+        logger.info(f"Classified {len(representatives)} representatives for {missed} uncached comments "
+                    f"(compression {missed / len(representatives):.1f}x)")
+
+    return [LABEL_MAP[result["label"]] for result in results]
+
+def _infer(texts: list[str]) -> list[dict]:
+    """Transformer results for `texts`, which are added to the sentiment cache."""
+    engine = get_sentiment_engine()
+    with timed("inference"):
+        fresh = engine.classify(texts)
+    COMMENTS_PROCESSED.labels("inferred").inc(len(texts))
+    sentiment_cache.store(texts, fresh, MODEL_TAG)
+    return fresh
+
+def _classify_uncached(texts: list[str]) -> list[dict]:
+    """
+    Pipeline results for texts the cache does not know.
+    
+    With a cascade model configured, the lexical tier labels every text and
+    only those below CASCADE_THRESHOLD confidence escalate to the transformer.
+    A CASCADE_AUDIT_RATE share of the confident ones is also sent, to keep
+    measuring agreement; the transformer's label wins there. Lexical labels
+    are not cached, so a later model change never serves them as transformer
+    output.
+    """
+    model = get_lexical_model() if config.cascade_threshold > 0 else None
+    if model is None:
+        return _infer(texts)
+
+    with timed("lexical"):
+        results, confidence = model.predict(texts)
+    escalated = [i for i, c in enumerate(confidence) if c < config.cascade_threshold]
+    audited = [
+        i for i, c in enumerate(confidence)
+        if c >= config.cascade_threshold and random.random() < config.cascade_audit_rate
+    ]
+    lexical = {i: results[i] for i in audited}
+    send = sorted(escalated + audited)
+    if send:
+        for i, result in zip(send, _infer([texts[i] for i in send])):
+            results[i] = result
+
+    agreed = sum(lexical[i]["label"] == results[i]["label"] for i in audited)
+    CASCADE_AUDITS.labels("agree").inc(agreed)
+    CASCADE_AUDITS.labels("disagree").inc(len(audited) - agreed)
+    COMMENTS_PROCESSED.labels("lexical").inc(len(texts) - len(send))
+    from services.lexical_model import cascade_stats
+    cascade_stats.record(len(texts), len(escalated), len(audited), agreed)
+    return results
+
+def _empty_result():
+    return {
+        "total": 0,
+        "counts": {"positive": 0, "neutral": 0, "negative": 0},
+        "percentages": {"positive": 0, "neutral": 0, "negative": 0},
+        "comments": {"positive": [], "neutral": [], "negative": []},
+        "takeaways": {"positive": [], "negative": []}
+    }
+
+def load_comment_list(comments_data: list[dict]) -> list[str]:
+    """Comment texts from in-memory comment records."""
+    import pandas as pd
+    with timed("dataframe_load"):
         df = pd.DataFrame(comments_data)
-    else:
-        file_path = data_paths.get_comments_file()
-        if not os.path.exists(file_path):
-            return {
-                "total": 0,
-                "counts": {"positive": 0, "neutral": 0, "negative": 0},
-                "percentages": {"positive": 0, "neutral": 0, "negative": 0},
-                "comments": {"positive": [], "neutral": [], "negative": []},
-                "takeaways": {"positive": [], "negative": []}
-            }
-        df = DataFrameOperations.load_comments_from_excel(file_path)
-
-    if df.empty or "Comments" not in df.columns:
-        return {
-            "total": 0,
-            "counts": {"positive": 0, "neutral": 0, "negative": 0},
-            "percentages": {"positive": 0, "neutral": 0, "negative": 0},
-            "comments": {"positive": [], "neutral": [], "negative": []},
-            "takeaways": {"positive": [], "negative": []}
-        }
-
-    LABEL_MAP = {"POS": "positive", "NEG": "negative", "NEU": "neutral"}
-    grouped_comments = defaultdict(list)
+        if df.empty or "Comments" not in df.columns:
+            return []
+        return df["Comments"].astype(str).tolist()
 
-    comment_list = df["Comments"].astype(str).tolist()
-    results = sentiment_pipeline(comment_list)
+def analyze_sentiment(comment_list: list[str]) -> dict:
+    """Sentiment counts, percentages and grouped comments, without takeaways."""
+    if not comment_list:
+        return _empty_result()
 
-    for comment, result in zip(comment_list, results):
-        label = LABEL_MAP[result["label"]]
-        grouped_comments[label].append(comment)
+    grouped_comments = defaultdict(list)
 
-    total = len(comment_list)
+    for comment, label in zip(comment_list, label_comments(comment_list)):
+        grouped_comments[label].append(comment)
 
     counts = {
         "positive": len(grouped_comments["positive"]),
@@ -65,21 +253,107 @@ def classify_comments(gemini_api_key: str = None, comments_data: list[dict] = No
         "negative": len(grouped_comments["negative"])
     }
 
+    return _build_result(counts, grouped_comments)
+
+def analyze_post_sentiment(post_id: str) -> dict:
+    """
+    Sentiment for a stored post, classifying only comments not labelled yet.
+    
+    Labels and running counts live in the comment store, so after an
+    incremental scrape only the new comments reach the model.
+    """
+    with timed("store_read"):
+        pending = comment_store.load_unlabeled(post_id)
+    if pending:
+        labels = label_comments([message for _, message in pending])
+        with timed("store_write"):
+            comment_store.save_labels(post_id, [(comment_id, label) for (comment_id, _), label in zip(pending, labels)])
+
+    counts = comment_store.get_counts(post_id)
+    if sum(counts.values()) == 0:
+        return _empty_result()
+
+    with timed("store_read"):
+        grouped = comment_store.load_grouped(post_id)
+    return _build_result(counts, grouped)
+
+def _summary(counts: dict) -> dict:
+    total = sum(counts.values())
+
     percentages = {
         k: round((v / total) * 100, 2) if total > 0 else 0
         for k, v in counts.items()
     }
 
-    takeaways = extract_combined_takeaways(
-        grouped_comments["positive"],
-        grouped_comments["negative"],
-        api_key=gemini_api_key
-    )
+    return {"total": total, "counts": counts, "percentages": percentages}
 
+def _build_result(counts: dict, grouped_comments: dict) -> dict:
     return {
-        "total": total,
-        "counts": counts,
-        "percentages": percentages,
+        **_summary(counts),
         "comments": grouped_comments,
-        "takeaways": takeaways,
-    }
\ No newline at end of file
+        "takeaways": {"positive": [], "negative": []},
+    }
+
+def add_takeaways(result: dict, gemini_api_key: str = None, post_id: str = None, model=None) -> dict:
+    """Fill in the Gemini takeaways for an analyze_sentiment result; `model` overrides the Gemini client."""
+    if result["total"] == 0:
+        return result
+
+    with timed("takeaways"):
+        result["takeaways"] = extract_combined_takeaways(
+            result["comments"]["positive"],
+            result["comments"]["negative"],
+            api_key=gemini_api_key,
+            scope=post_id,
+            model=model
+        )
+    return result
+
+def classify_comments(gemini_api_key: str = None, comments_data: list[dict] = None, post_id: str = None):
+    """
+    Classify comments for sentiment analysis.
+    
+    Args:
+        gemini_api_key: API key for Gemini insights
+        comments_data: Optional list of comment dictionaries in-memory.
+        post_id: Post whose comments are read from the comment store
+                 when comments_data is not given.
+    """
+    if comments_data is not None:
+        result = analyze_sentiment(load_comment_list(comments_data))
+    elif post_id:
+        result = analyze_post_sentiment(post_id)
+    else:
+        result = _empty_result()
+    return add_takeaways(result, gemini_api_key, post_id)
+
+def iter_post_sentiment(post_id: str, gemini_api_key: str = None, chunk_size: int = 256):
+    """
+    classify_comments for a stored post, as a sequence of (event, data) pairs.
+    
+    Comments labelled earlier are reported first, then each chunk of new
+    comments as soon as it is classified, with running counts, and finally
+    the takeaways. The last event carries the complete result.
+    """
+    pending = comment_store.load_unlabeled(post_id)
+    counts = comment_store.get_counts(post_id)
+    yield "start", {"postId": post_id, "total": sum(counts.values()) + len(pending), "pending": len(pending)}
+    if sum(counts.values()):
+        yield "progress", {**_summary(counts), "processed": 0, "comments": comment_store.load_grouped(post_id)}
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        labels = label_comments([message for _, message in chunk])
+        comment_store.save_labels(post_id, [(comment_id, label) for (comment_id, _), label in zip(chunk, labels)])
+
+        grouped = defaultdict(list)
+        for (_, message), label in zip(chunk, labels):
+            grouped[label].append(message)
+        counts = comment_store.get_counts(post_id)
+        yield "progress", {**_summary(counts), "processed": start + len(chunk), "comments": grouped}
+
+    if sum(counts.values()) == 0:
+        yield "takeaways", {"postId": post_id, **_empty_result()}
+        return
+    result = add_takeaways(_build_result(counts, comment_store.load_grouped(post_id)), gemini_api_key, post_id)
+    yield "takeaways", {"postId": post_id, **result}
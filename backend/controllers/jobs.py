@@ -0,0 +1,29 @@
+from functools import partial
+from controllers.classify import add_takeaways, analyze_post_sentiment
+from services.facebook_service import FacebookService
+from services.job_queue import Job, job_queue
+from services.single_flight import credential_digest, single_flight
+
+def submit_analysis_job(service: FacebookService, post_id: str, gemini_api_key: str,
+                        incremental: bool = True) -> Job:
+    """
+    Queue fetch -> classify -> takeaways for a post and return the job at once.
+    
+    The completed job's result has the same shape as the /classify response.
+    """
+    def fetch(_):
+        # Same key as POST /scrape, so a job and a direct scrape of the post share one fetch
+        return single_flight.do(
+            (service.page_id, (post_id, credential_digest(service.access_token)),
+             "scrape" if incremental else "scrape_full"),
+            partial(service.scrape_comments, post_id, incremental=incremental)
+        )
+
+    def classify(_):
+        return analyze_post_sentiment(post_id)
+
+    def takeaways(result):
+        return {"postId": post_id, **add_takeaways(result, gemini_api_key, post_id)}
+
+    stages = [("fetch", fetch), ("classify", classify), ("takeaways", takeaways)]
+    return job_queue.submit(stages, meta={"postId": post_id})
@@ -1,15 +1,44 @@
+import asyncio
+import json
 import logging
-from fastapi import FastAPI, Request, HTTPException
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from fastapi import FastAPI, Request, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, validator
+from typing import Optional
 import os
 
 # Import services and utilities
 from services.facebook_service import FacebookService
-from controllers.classify import classify_comments
+from services.comment_store import comment_store
+from services.metrics import REQUEST_SECONDS, render_latest, server_timing, start_profile, timed
+from services.sentiment_cache import sentiment_cache
+from services.takeaway_cache import takeaway_cache
+from services.posts_cache import posts_cache
+from services.single_flight import credential_digest, single_flight
+from controllers.classify import (
+    classify_comments, get_batching_stats, get_model_state, iter_post_sentiment, shutdown_sentiment_engine,
+    warm_up_sentiment_model
+)
+from controllers.jobs import submit_analysis_job
+from services.job_queue import TERMINAL_STATUSES, QueueFullError, job_queue
 from utils import config, logger
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.preload_model:
+        # Load in the background so the API serves /posts while the model warms up
+        threading.Thread(target=warm_up_sentiment_model, name="model-warmup", daemon=True).start()
+    job_queue.start()
+    yield
+    job_queue.stop()
+    shutdown_sentiment_engine()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -21,10 +50,28 @@ app.add_middleware(
         "X-FB-Page-Id",
         "X-FB-Access-Token",
         "X-Gemini-Api-Key",
+        "X-Profile",
+        "If-None-Match",
         "Content-Type"
     ],
+    expose_headers=["Server-Timing", "ETag", "X-Cache"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Request latency histogram; with `X-Profile: 1`, stage timings in a Server-Timing header."""
+    profiling = request.headers.get("X-Profile", "").lower() in ("1", "true")
+    spans = start_profile() if profiling else None
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    REQUEST_SECONDS.labels(request.method, route.path if route else "unmatched", str(response.status_code)).observe(elapsed)
+    if profiling:
+        response.headers["Server-Timing"] = server_timing(spans, elapsed)
+    return response
+
 def get_credentials(request: Request) -> tuple[str, str]:
     """Extract and validate credentials from headers with fallback."""
     page_id = request.headers.get("X-FB-Page-Id", "").strip() or config.fb_page_id
@@ -38,8 +85,28 @@ def get_credentials(request: Request) -> tuple[str, str]:
 
     return page_id, access_token
 
+def get_page_id(request: Request) -> str:
+    """Page the request is about, for keys of work that does not otherwise need credentials."""
+    return request.headers.get("X-FB-Page-Id", "").strip() or config.fb_page_id or ""
+
+def get_gemini_api_key(request: Request) -> str:
+    """Extract the Gemini API key from headers with fallback."""
+    gemini_api_key = request.headers.get("X-Gemini-Api-Key", "").strip() or config.gemini_api_key
+
+    if not gemini_api_key:
+        raise HTTPException(
+            status_code=400,
+            detail="Missing Gemini API key. Provide X-Gemini-Api-Key header."
+        )
+
+    return gemini_api_key
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 class PostRequest(BaseModel):
     post_id: str
+    full_refresh: bool = False
 
     @validator('post_id')
     def validate_post_id(cls, v):
@@ -47,18 +114,61 @@ class PostRequest(BaseModel):
             raise ValueError('post_id cannot be empty')
         return v.strip()
 
+class BatchScrapeRequest(BaseModel):
+    post_ids: Optional[list[str]] = None
+    limit: int = 20
+
+    @validator('post_ids')
+    def validate_post_ids(cls, v):
+        if v is None:
+            return v
+        post_ids = [p.strip() for p in v if p and p.strip()]
+        if not post_ids:
+            raise ValueError('post_ids cannot be empty')
+        return post_ids
+
+@app.get("/ready")
+def readiness():
+    """
+    Readiness probe: 200 once the sentiment model is loaded and warmed up.
+    
+    Without PRELOAD_MODEL the model loads on the first classification, so
+    the app is ready as soon as it serves requests.
+    """
+    state = get_model_state()
+    status_code = 200 if state["status"] == "ready" or not config.preload_model else 503
+    return JSONResponse(status_code=status_code, content={"ready": status_code == 200, "sentimentModel": state})
+
 @app.get("/posts")
-def get_posts(request: Request):
-    """Fetch posts from Facebook page using credentials from headers."""
+def get_posts(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None,
+    before: Optional[str] = None
+):
+    """
+    Fetch posts from Facebook page using credentials from headers.
+    
+    Page through with the `after`/`before` cursors from `paging`. Pages are
+    cached (stale ones are served while refreshing in the background); the
+    response carries an ETag, and `If-None-Match` gets a 304 when unchanged.
+    """
     try:
         page_id, access_token = get_credentials(request)
+        if after and before:
+            raise HTTPException(status_code=400, detail="Pass either after or before, not both.")
         
         # Use service instead of direct API calls
-        service = FacebookService()
-        service.page_id = page_id
-        service.access_token = access_token
+        service = FacebookService(page_id, access_token)
         
-        return service.get_recent_posts()
+        key = posts_cache.make_key(page_id, access_token, limit, after, before)
+        fetch = partial(service.fetch_posts_page, limit, after, before)
+        # Concurrent cache misses for the same page share one Graph call
+        page, digest, state = single_flight.do((page_id, key, "posts"), partial(posts_cache.get, key, fetch))
+        headers = {"ETag": f'"{digest}"', "X-Cache": state}
+        if f'"{digest}"' in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(page, headers=headers)
         
     except HTTPException:
         raise
@@ -73,15 +183,20 @@ def scrape_comments_endpoint(data: PostRequest, request: Request):
         page_id, access_token = get_credentials(request)
         
         # Use service instead of direct function
-        service = FacebookService()
-        service.page_id = page_id
-        service.access_token = access_token
+        service = FacebookService(page_id, access_token)
         
-        total_comments = service.scrape_comments(data.post_id)
+        # Identical scrapes already running (a post everyone opened at once) are joined, not repeated;
+        # the token is part of the key so a joiner never inherits another caller's token or its failure
+        new_comments = single_flight.do(
+            (page_id, (data.post_id, credential_digest(access_token)),
+             "scrape_full" if data.full_refresh else "scrape"),
+            partial(service.scrape_comments, data.post_id, incremental=not data.full_refresh)
+        )
         
         return {
             "message": "Comments scraped successfully",
-            "total_comments": total_comments
+            "total_comments": comment_store.count_comments(data.post_id),
+            "new_comments": new_comments
         }
         
     except HTTPException:
@@ -90,25 +205,168 @@ def scrape_comments_endpoint(data: PostRequest, request: Request):
         logger.error(f"Unexpected error in scrape endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="An internal error occurred")
 
-@app.get("/classify")
-def get_classification(post_id: str, request: Request):
-    """Classify comments for a given post_id."""
+@app.post("/scrape/batch")
+def scrape_batch_endpoint(data: BatchScrapeRequest, request: Request):
+    """Scrape comments for many posts (default: the page's recent posts) in one or two round trips."""
     try:
-        gemini_api_key = request.headers.get("X-Gemini-Api-Key", "").strip() or config.gemini_api_key
+        page_id, access_token = get_credentials(request)
+        service = FacebookService(page_id, access_token)
+        token_digest = credential_digest(access_token)
 
-        if not gemini_api_key:
-            raise HTTPException(
-                status_code=400,
-                detail="Missing Gemini API key. Provide X-Gemini-Api-Key header."
+        if data.post_ids:
+            totals = single_flight.do(
+                (page_id, (tuple(sorted(data.post_ids)), token_digest), "scrape_batch"),
+                partial(service.scrape_posts, data.post_ids)
+            )
+        else:
+            totals = single_flight.do(
+                (page_id, (f"recent:{data.limit}", token_digest), "scrape_batch"),
+                partial(service.scrape_recent_posts, limit=data.limit)
             )
 
-        result = classify_comments(gemini_api_key=gemini_api_key)
         return {
-            "postId": post_id,
-            **result
+            "message": "Comments scraped successfully",
+            "posts": totals,
+            "total_comments": sum(comment_store.count_comments(post_id) for post_id in totals),
+            "new_comments": sum(totals.values())
         }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in batch scrape endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+@app.get("/classify")
+def get_classification(post_id: str, request: Request):
+    """Classify comments for a given post_id."""
+    try:
+        gemini_api_key = get_gemini_api_key(request)
+
+        # Concurrent requests only coalesce per Gemini key, so each call runs on its caller's key and quota;
+        # the takeaway cache is keyed by content and may still serve takeaways another key generated
+        result = single_flight.do(
+            (get_page_id(request), (post_id, credential_digest(gemini_api_key)), "classify"),
+            partial(classify_comments, gemini_api_key=gemini_api_key, post_id=post_id)
+        )
+        with timed("serialize"):
+            return JSONResponse({
+                "postId": post_id,
+                **result
+            })
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error in classification: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Classification failed")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Classification failed")
+
+@app.get("/classify/stream")
+def stream_classification(post_id: str, request: Request):
+    """
+    Classify comments for a post as Server-Sent Events.
+    
+    Emits `start`, a `progress` event per classified chunk (running counts,
+    percentages and that chunk's comments) and a final `takeaways` event with
+    the same payload /classify returns.
+    """
+    gemini_api_key = get_gemini_api_key(request)
+
+    def events():
+        try:
+            for event, data in iter_post_sentiment(post_id, gemini_api_key, config.classify_stream_chunk):
+                yield sse_event(event, data)
+        except Exception as e:
+            logger.error(f"Error in streaming classification: {e}", exc_info=True)
+            yield sse_event("error", {"detail": "Classification failed"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/export")
+def export_comments(post_id: str):
+    """Download the stored comments for a post as an Excel file."""
+    try:
+        if comment_store.count_comments(post_id) == 0:
+            raise HTTPException(status_code=404, detail="No comments stored for this post")
+
+        file_path = comment_store.export_to_excel(post_id)
+        return FileResponse(
+            file_path,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            filename=file_path.name
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting comments: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Export failed")
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics: stage latencies, comment counters, cache events and external API errors."""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Hit/miss counters for the caches, plus deduplication, cascade and request-coalescing savings."""
+    from services.dedup import dedup_stats
+    from services.lexical_model import cascade_stats
+    return {
+        "sentiment": sentiment_cache.stats(),
+        "takeaways": takeaway_cache.stats(),
+        "dedup": dedup_stats.stats(),
+        "cascade": cascade_stats.stats(),
+        "posts": posts_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "batching": get_batching_stats(),
+    }
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(data: PostRequest, request: Request):
+    """Queue scrape + classify + takeaways for a post and return a job id immediately."""
+    try:
+        page_id, access_token = get_credentials(request)
+        gemini_api_key = get_gemini_api_key(request)
+
+        service = FacebookService(page_id, access_token)
+
+        job = submit_analysis_job(service, data.post_id, gemini_api_key, incremental=not data.full_refresh)
+        return job.to_dict()
+
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error submitting job: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal error occurred")
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Poll a job's status; the result is included once it has completed."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    """Stream a job's status changes as Server-Sent Events until it finishes."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last_version = -1
+        while True:
+            version, state = job_queue.snapshot(job)
+            if version != last_version:
+                last_version = version
+                yield sse_event(state["status"], state)
+                if state["status"] in TERMINAL_STATUSES:
+                    return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
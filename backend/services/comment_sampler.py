@@ -0,0 +1,107 @@
+"""Representative comment sampling via mini-batch k-means over hashed features."""
+from typing import List, Optional, Tuple
+import numpy as np
+from services.text_features import hashed_features
+
+
+def _sq_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Squared Euclidean distances up to a per-row constant (rows are unit length)."""
+    return (centers * centers).sum(axis=1)[None, :] - 2.0 * points @ centers.T
+
+
+def _init_centers(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding on a bounded subsample."""
+    sample = points[rng.choice(len(points), size=min(len(points), 20 * k), replace=False)]
+    centers = [sample[rng.integers(len(sample))]]
+    closest = ((sample - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            break
+        center = sample[rng.choice(len(sample), p=closest / total)]
+        centers.append(center)
+        closest = np.minimum(closest, ((sample - center) ** 2).sum(axis=1))
+    return np.array(centers, dtype=np.float32)
+
+
+def minibatch_kmeans(points: np.ndarray, k: int, weights: Optional[np.ndarray] = None, iterations: int = 30,
+                     batch_size: int = 1024, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (centers, labels) using Sculley's mini-batch k-means.
+    
+    `weights` (e.g. duplicate counts) make heavier points proportionally
+    more likely to be drawn into each mini-batch.
+    """
+    rng = np.random.default_rng(seed)
+    centers = _init_centers(points, k, rng)
+    counts = np.zeros(len(centers), dtype=np.float32)
+    p = weights / weights.sum() if weights is not None else None
+    
+    for _ in range(iterations):
+        batch = points[rng.choice(len(points), size=min(batch_size, len(points)), p=p)]
+        labels = _sq_distances(batch, centers).argmin(axis=1)
+        onehot = np.zeros((len(centers), len(batch)), dtype=np.float32)
+        onehot[labels, np.arange(len(batch))] = 1.0
+        batch_counts = onehot.sum(axis=1)
+        batch_sums = onehot @ batch
+        counts += batch_counts
+        seen = batch_counts > 0
+        # Per-center learning rate 1/count, applied to the whole batch at once
+        centers[seen] += (batch_sums[seen] - batch_counts[seen, None] * centers[seen]) / counts[seen, None]
+    
+    return centers, _sq_distances(points, centers).argmin(axis=1)
+
+
+def _annotate(comment: str, count: int) -> str:
+    return f"{comment} (×{count} similar)" if count > 1 else comment
+
+
+def sample_representatives(comments: List[str], budget: int, seed: int = 0) -> List[str]:
+    """
+    Pick up to `budget` distinct comments that cover every theme in `comments`.
+    
+    Exact duplicates are collapsed first. The distinct comments are then
+    clustered into about budget/2 groups; each cluster gets picks in
+    proportion to how many comments it stands for (at least one), taken
+    closest to its centroid first. The most central pick is annotated with
+    the cluster size so the prompt still conveys how common a theme is.
+    Output is ordered by cluster size, largest first.
+    """
+    counts_by_text = {}
+    for comment in comments:
+        counts_by_text[comment] = counts_by_text.get(comment, 0) + 1
+    unique = list(counts_by_text)
+    weights = np.array([counts_by_text[c] for c in unique], dtype=np.float64)
+    
+    if len(unique) <= budget:
+        order = np.argsort(-weights, kind="stable")
+        return [_annotate(unique[i], int(weights[i])) for i in order]
+    
+    points = hashed_features(unique)
+    k = max(1, budget // 2)
+    centers, labels = minibatch_kmeans(points, k, weights=weights, seed=seed)
+    distances = _sq_distances(points, centers)[np.arange(len(points)), labels]
+    
+    sizes = np.bincount(labels, weights=weights, minlength=len(centers))
+    members_per_cluster = np.bincount(labels, minlength=len(centers))
+    clusters = [c for c in np.argsort(-sizes, kind="stable") if sizes[c] > 0]
+    picks = {c: 1 for c in clusters[:budget]}
+    spare = budget - len(picks)
+    if spare > 0:
+        # Largest-remainder apportionment of the spare picks by cluster size
+        shares = spare * sizes[clusters] / sizes[clusters].sum()
+        extra = np.floor(shares).astype(int)
+        leftover = spare - extra.sum()
+        extra[np.argsort(-(shares - extra), kind="stable")[:leftover]] += 1
+        for c, n in zip(clusters, extra):
+            picks[c] = min(picks[c] + int(n), int(members_per_cluster[c]))
+    
+    sample = []
+    for c in clusters:
+        if c not in picks:
+            continue
+        members = np.flatnonzero(labels == c)
+        members = members[np.argsort(distances[members], kind="stable")][:picks[c]]
+        for rank, i in enumerate(members):
+            sample.append(_annotate(unique[i], int(sizes[c]) if rank == 0 else int(weights[i])))
+    return sample
@@ -0,0 +1,230 @@
+"""Post-scoped comment storage backed by SQLite."""
+import sqlite3
+import uuid
+from contextlib import closing
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from utils import data_paths, logger, ErrorHandler, DataFrameOperations
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    post_id TEXT NOT NULL,
+    comment_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_time TEXT,
+    like_count INTEGER,
+    sentiment TEXT,
+    UNIQUE (post_id, comment_id)
+);
+CREATE INDEX IF NOT EXISTS idx_comments_post ON comments (post_id);
+CREATE TABLE IF NOT EXISTS post_state (
+    post_id TEXT PRIMARY KEY,
+    watermark TEXT,
+    positive INTEGER NOT NULL DEFAULT 0,
+    neutral INTEGER NOT NULL DEFAULT 0,
+    negative INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+SENTIMENTS = ("positive", "neutral", "negative")
+# Rows staged per temp-table commit while a scrape is still fetching
+_STAGE_BATCH = 500
+
+
+class CommentStore:
+    """
+    Comments keyed by post_id, so concurrent scrapes of different posts never
+    overwrite each other. Writes are append-friendly and readers keep seeing
+    the previous snapshot until a scrape commits. Excel is export-only.
+    
+    Each post also has a watermark (newest `created_time` ingested) for
+    incremental scrapes, and running sentiment counts that grow as newly
+    stored comments are labelled.
+    """
+    
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(comments)")}
+            if "sentiment" not in columns:
+                conn.execute("ALTER TABLE comments ADD COLUMN sentiment TEXT")
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    @staticmethod
+    def _to_row(post_id: str, comment: Dict[str, Any]) -> tuple:
+        return (
+            post_id,
+            comment.get("id") or uuid.uuid4().hex,
+            str(comment.get("Comments", "")),
+            comment.get("created_time"),
+            comment.get("like_count"),
+        )
+    
+    def write_comments(self, post_id: str, comments: Iterable[Dict[str, Any]], replace: bool = True) -> int:
+        """
+        Store comments for a post, swapping them in with one short transaction.
+        
+        `comments` may be a lazy iterable (e.g. pages streamed from the Graph
+        API). Rows are staged in a temporary table as they are produced, so
+        the store's write lock is only taken for the final swap and never
+        while the iterable is still fetching. With `replace` the post's
+        previous comments are dropped in that same transaction.
+        
+        Returns the number of newly inserted comments.
+        """
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "CREATE TEMP TABLE staged (comment_id TEXT, message TEXT, created_time TEXT, like_count INTEGER)"
+                )
+                rows = (self._to_row(post_id, c)[1:] for c in comments)
+                while True:
+                    batch = list(islice(rows, _STAGE_BATCH))
+                    if not batch:
+                        break
+                    # Only the connection's temp database is written here
+                    with conn:
+                        conn.executemany("INSERT INTO staged VALUES (?, ?, ?, ?)", batch)
+                
+                with conn:
+                    if replace:
+                        conn.execute("DELETE FROM comments WHERE post_id = ?", (post_id,))
+                        conn.execute("DELETE FROM post_state WHERE post_id = ?", (post_id,))
+                    before = conn.total_changes
+                    conn.execute(
+                        "INSERT OR IGNORE INTO comments (post_id, comment_id, message, created_time, like_count) "
+                        "SELECT ?, comment_id, message, created_time, like_count FROM staged ORDER BY rowid",
+                        (post_id,)
+                    )
+                    inserted = conn.total_changes - before
+                    conn.execute("INSERT OR IGNORE INTO post_state (post_id) VALUES (?)", (post_id,))
+                    conn.execute(
+                        "UPDATE post_state SET watermark = "
+                        "(SELECT MAX(created_time) FROM comments WHERE post_id = ? AND created_time != '') "
+                        "WHERE post_id = ?", (post_id, post_id)
+                    )
+            logger.info(f"Stored {inserted} comments for post {post_id}")
+            return inserted
+        except sqlite3.Error as e:
+            ErrorHandler.handle_data_error(e, "write_comments")
+            raise
+    
+    def load_comments(self, post_id: str) -> List[str]:
+        """Return the comment messages for a post in ingestion order."""
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT message FROM comments WHERE post_id = ? ORDER BY rowid", (post_id,)
+                ).fetchall()
+            return [row[0] for row in rows]
+        except sqlite3.Error as e:
+            ErrorHandler.handle_data_error(e, "load_comments")
+            raise
+    
+    def load_records(self, post_id: str) -> List[Dict[str, Any]]:
+        """Return full comment records for a post, shaped like scraped comments."""
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT comment_id, message, created_time, like_count FROM comments "
+                    "WHERE post_id = ? ORDER BY rowid", (post_id,)
+                ).fetchall()
+            return [
+                {"id": cid, "Comments": message, "created_time": created_time, "like_count": like_count}
+                for cid, message, created_time, like_count in rows
+            ]
+        except sqlite3.Error as e:
+            ErrorHandler.handle_data_error(e, "load_records")
+            raise
+    
+    def count_comments(self, post_id: str) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM comments WHERE post_id = ?", (post_id,)).fetchone()[0]
+    
+    def get_watermark(self, post_id: str) -> Optional[str]:
+        """Newest `created_time` stored for a post, or None if never scraped."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT watermark FROM post_state WHERE post_id = ?", (post_id,)).fetchone()
+        return row[0] if row else None
+    
+    def load_unlabeled(self, post_id: str) -> List[Tuple[str, str]]:
+        """(comment id, message) for comments that have no sentiment label yet."""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT comment_id, message FROM comments WHERE post_id = ? AND sentiment IS NULL ORDER BY rowid",
+                (post_id,)
+            ).fetchall()
+    
+    def save_labels(self, post_id: str, labels: List[Tuple[str, str]]) -> None:
+        """
+        Label comments and add them to the post's running counts.
+        
+        Only rows that were still unlabelled are counted, so concurrent
+        classifications of the same post cannot double count.
+        """
+        by_label: Dict[str, List[str]] = {}
+        for comment_id, label in labels:
+            by_label.setdefault(label, []).append(comment_id)
+        
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("INSERT OR IGNORE INTO post_state (post_id) VALUES (?)", (post_id,))
+                for label, comment_ids in by_label.items():
+                    if label not in SENTIMENTS:
+                        raise ValueError(f"Unknown sentiment label: {label}")
+                    before = conn.total_changes
+                    conn.executemany(
+                        "UPDATE comments SET sentiment = ? WHERE post_id = ? AND comment_id = ? AND sentiment IS NULL",
+                        ((label, post_id, comment_id) for comment_id in comment_ids)
+                    )
+                    added = conn.total_changes - before
+                    conn.execute(
+                        f"UPDATE post_state SET {label} = {label} + ? WHERE post_id = ?", (added, post_id)
+                    )
+        except sqlite3.Error as e:
+            ErrorHandler.handle_data_error(e, "save_labels")
+            raise
+    
+    def load_labelled(self, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+        """(message, sentiment) for labelled comments across all posts, newest first."""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT message, sentiment FROM comments WHERE sentiment IS NOT NULL ORDER BY rowid DESC LIMIT ?",
+                (limit or -1,)
+            ).fetchall()
+    
+    def get_counts(self, post_id: str) -> Dict[str, int]:
+        """Running sentiment counts for a post."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT positive, neutral, negative FROM post_state WHERE post_id = ?", (post_id,)
+            ).fetchone()
+        return dict(zip(SENTIMENTS, row or (0, 0, 0)))
+    
+    def load_grouped(self, post_id: str) -> Dict[str, List[str]]:
+        """Labelled comment messages for a post, grouped by sentiment."""
+        grouped: Dict[str, List[str]] = {label: [] for label in SENTIMENTS}
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT sentiment, message FROM comments WHERE post_id = ? AND sentiment IS NOT NULL "
+                "ORDER BY rowid", (post_id,)
+            )
+            for label, message in rows:
+                grouped[label].append(message)
+        return grouped
+    
+    def export_to_excel(self, post_id: str) -> Path:
+        """Write a post's comments to an Excel file and return its path."""
+        file_path = data_paths.get_comments_file(post_id)
+        DataFrameOperations.save_comments_to_excel(self.load_records(post_id), file_path)
+        return file_path
+
+
+comment_store = CommentStore(data_paths.get_comment_store_file())
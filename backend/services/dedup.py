@@ -0,0 +1,145 @@
+"""Near-duplicate grouping of comments with MinHash signatures and an LSH index."""
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Dict, List, Tuple
+import numpy as np
+from utils import config
+
+_SHINGLE = 4
+# Near-duplicates show up early in the text; longer comments are compared on their prefix
+_MAX_CHARS = 200
+_SPACE_RE = re.compile(r"\s+")
+_MENTION_RE = re.compile(r"@\w+")
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_NEGATION_RE = re.compile(r"\b(?:not|no|never|nothing|nobody|none|cannot|without|\w+n't)\b")
+
+
+def _canonical(text: str) -> str:
+    """Lower-case, strip @mentions and collapse whitespace so copypasta lines up."""
+    return _SPACE_RE.sub(" ", _MENTION_RE.sub(" ", text.lower())).strip()
+
+
+def _token_key(canonical: str) -> Tuple[Tuple[str, ...], frozenset]:
+    """
+    Words in order plus the set of emoji/symbols, ignoring punctuation and spacing.
+
+    Two texts with the same key differ only in @mentions, punctuation,
+    whitespace or repeated symbols, so they cannot differ in sentiment words.
+    Digits stay in the words: "10/10" and "0/10" are different reviews.
+    """
+    symbols = frozenset(ch for ch in canonical if unicodedata.category(ch).startswith("S"))
+    return tuple(_WORD_RE.findall(canonical)), symbols
+
+
+def _shingles(text: str) -> set:
+    text = text[:_MAX_CHARS]
+    return {text[i:i + _SHINGLE] for i in range(max(1, len(text) - _SHINGLE + 1))}
+
+
+class MinHashLSH:
+    """
+    Greedy duplicate grouping.
+
+    Texts always group when their token keys match (same words, same emoji),
+    which is safe for sentiment. With `threshold` below 1, looser near-matches
+    are also grouped: each text gets a MinHash signature over character
+    4-grams, signatures are split into bands, and texts sharing a band bucket
+    with a group's representative join it if the estimated Jaccard similarity
+    clears `threshold` and both carry the same negations. That looser mode
+    can merge texts that swap one sentiment word ("best" / "worst"), so it is
+    opt-in.
+    """
+
+    def __init__(self, threshold: float = 1.0, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: odd 64-bit multipliers, keep the high 32 bits
+        self._a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """MinHash signature per text, computed for all texts in one vectorised pass."""
+        shingle_sets = [_shingles(text) for text in texts]
+        # Comments share most of their shingles, so hash each distinct one once
+        vocabulary = {gram for grams in shingle_sets for gram in grams}
+        hash_of = {gram: zlib.crc32(gram.encode("utf-8")) for gram in vocabulary}
+        sizes = [len(grams) for grams in shingle_sets]
+        hashes = np.fromiter((hash_of[g] for grams in shingle_sets for g in grams), dtype=np.uint64, count=sum(sizes))
+        starts = np.cumsum([0] + sizes[:-1])
+        # One row per permutation keeps the reduction over contiguous memory
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return np.minimum.reduceat(permuted, starts, axis=1).T
+
+    def group(self, texts: List[str], min_chars: int = 0) -> List[int]:
+        """
+        Representative index for each text (a representative maps to itself).
+
+        Texts shorter than `min_chars` after canonicalisation carry too few
+        shingles for a reliable estimate and are only grouped by token key.
+        """
+        canonical = [_canonical(text) for text in texts]
+        owners: List[int] = []
+        exact: Dict[tuple, int] = {}
+        for i, text in enumerate(canonical):
+            key = _token_key(text)
+            # Texts without words ("!!!", "...") only match themselves exactly
+            owners.append(exact.setdefault(key if key[0] else (text,), i))
+
+        if self.threshold >= 1.0:
+            return owners
+        candidates = [i for i, owner in enumerate(owners) if owner == i and len(canonical[i]) >= min_chars]
+        if not candidates:
+            return owners
+        sigs = self.signatures([canonical[i] for i in candidates])
+        # Collapse each band of rows into one 64-bit bucket key, for every candidate at once
+        band_keys = (sigs.reshape(len(candidates), self.bands, self.rows) * self._a[:self.rows]).sum(axis=2).tolist()
+
+        buckets: Dict[Tuple[int, int], int] = {}
+        negations: Dict[int, frozenset] = {}
+        row_of: Dict[int, int] = {}
+        for row, i in enumerate(candidates):
+            neg = frozenset(_NEGATION_RE.findall(canonical[i]))
+            keys = list(enumerate(band_keys[row]))
+            for key in keys:
+                rep = buckets.get(key)
+                if rep is not None and negations[rep] == neg and (sigs[row_of[rep]] == sigs[row]).mean() >= self.threshold:
+                    owners[i] = rep
+                    break
+            else:
+                negations[i] = neg
+                row_of[i] = row
+                for key in keys:
+                    buckets.setdefault(key, i)
+
+        # Token-identical texts follow whichever group their first occurrence joined
+        return [owners[owner] for owner in owners]
+
+
+class DedupStats:
+    """Running totals of how much classification work deduplication saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.comments = 0
+        self.classified = 0
+
+    def record(self, comments: int, classified: int) -> None:
+        with self._lock:
+            self.comments += comments
+            self.classified += classified
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            ratio = round(self.comments / self.classified, 2) if self.classified else 0
+            return {"comments": self.comments, "classified": self.classified, "compression_ratio": ratio}
+
+
+near_duplicates = MinHashLSH(threshold=config.dedup_threshold or 1.0)
+dedup_stats = DedupStats()
@@ -1,29 +1,65 @@
 """Facebook service for handling Graph API operations and data processing."""
+import json
+import queue
+import threading
+from datetime import datetime
 import requests
-import pandas as pd
-from typing import Dict, Any, List
-from utils import config, data_paths, logger, ErrorHandler, DataFrameOperations
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+from utils import config, logger, ErrorHandler
+from services.comment_store import comment_store
+from services.graph_client import graph_client
+from services.metrics import COMMENTS_PROCESSED, timed
+
+COMMENT_FIELDS = "from{id,name,link},message,created_time,like_count"
+COMMENT_PAGE_SIZE = 100
+GRAPH_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+# Graph API accepts at most 50 sub-requests per batch call
+GRAPH_BATCH_LIMIT = 50
+
+_PAGE_DONE = object()
 
 
 class FacebookService:
     """Consolidated service for all Facebook-related operations."""
     
-    def __init__(self):
-        self.page_id, self.access_token = config.validate_fb_credentials()
+    def __init__(self, page_id: Optional[str] = None, access_token: Optional[str] = None):
+        if page_id and access_token:
+            self.page_id, self.access_token = page_id, access_token
+        else:
+            self.page_id, self.access_token = config.validate_fb_credentials()
         self.api_version = config.fb_api_version
-        self.base_url = f"https://graph.facebook.com/{self.api_version}"
+        self.base_url = f"{config.fb_graph_url}/{self.api_version}"
     
-    def get_recent_posts(self, limit: int = 20) -> Dict[str, Any]:
+    def get_recent_posts(self, limit: int = 20, after: Optional[str] = None,
+                         before: Optional[str] = None) -> Dict[str, Any]:
         """Fetch recent posts from Facebook page."""
+        return self.fetch_posts_page(limit, after, before)[0]
+    
+    def fetch_posts_page(self, limit: int = 20, after: Optional[str] = None, before: Optional[str] = None,
+                         etag: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        One page of the page's posts and Graph's ETag for it.
+        
+        With `etag`, the request is conditional and the page comes back as
+        None when Graph reports it unchanged (304).
+        """
         url = f"{self.base_url}/{self.page_id}/posts"
         params = {
             "fields": "id,message,created_time,permalink_url",
             "access_token": self.access_token,
             "limit": limit
         }
+        if after:
+            params["after"] = after
+        if before:
+            params["before"] = before
+        headers = {"If-None-Match": etag} if etag else None
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = graph_client.get(url, params=params, headers=headers, operation="get_recent_posts")
+            if response.status_code == 304:
+                return None, etag
             response.raise_for_status()
             data = response.json()
             
@@ -42,56 +78,327 @@ class FacebookService:
             return {
                 "posts": posts,
                 "total": len(posts),
-                "paging": data.get("paging", {})
-            }
+                "paging": self._public_paging(data.get("paging", {}), limit)
+            }, response.headers.get("ETag")
             
         except requests.exceptions.RequestException as e:
             ErrorHandler.handle_request_error(e, "get_recent_posts")
             raise
     
-    def scrape_comments(self, post_id: str) -> int:
-        """Scrape comments for a specific post and save to Excel."""
-        url = f"{self.base_url}/{self.page_id}_{post_id}"
+    @staticmethod
+    def _public_paging(paging: Dict[str, Any], limit: int) -> Dict[str, Any]:
+        """
+        Graph's paging with `next`/`previous` rewritten as `/posts` links.
+        
+        Graph's own links embed the access token, so they are never passed on.
+        """
+        cursors = paging.get("cursors", {})
+        public = {"cursors": {key: cursors[key] for key in ("before", "after") if key in cursors}}
+        if paging.get("next") and "after" in cursors:
+            public["next"] = f"/posts?{urlencode({'limit': limit, 'after': cursors['after']})}"
+        if paging.get("previous") and "before" in cursors:
+            public["previous"] = f"/posts?{urlencode({'limit': limit, 'before': cursors['before']})}"
+        return public
+    
+    @staticmethod
+    def _to_comment(raw: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": raw.get("id", ""),
+            "Comments": raw.get("message", ""),
+            "created_time": raw.get("created_time", ""),
+            "like_count": raw.get("like_count", 0)
+        }
+    
+    def _fetch_comment_pages(
+        self,
+        post_id: str,
+        page_size: int,
+        first_page: Optional[Dict[str, Any]] = None,
+        since: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Fetch comment pages one request at a time, following `paging.next`.
+        
+        `first_page` is an already fetched comments edge response (e.g. from a
+        batch call); it is yielded first and only later pages are requested.
+        
+        With `since` (a Graph `created_time`), comments are requested newest
+        first and paging stops at the first comment older than the watermark.
+        Comments created in the watermark's own second are kept; the store
+        ignores the ones it already has.
+        """
+        url = f"{self.base_url}/{self.page_id}_{post_id}/comments"
         params = {
-            "fields": "comments.limit(100){from{id,name,link},message,created_time,like_count}",
+            "fields": COMMENT_FIELDS,
+            "limit": page_size,
             "access_token": self.access_token
         }
+        params.update(self._since_params(since))
         
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            comments_raw = data.get("comments", {}).get("data", [])
-            if not comments_raw:
-                return 0
-            
-            comments = [{"Comments": c.get("message", "")} for c in comments_raw]
+        for data in self._comment_edge_responses(url, params, first_page):
+            comments_raw = data.get("data", [])
+            reached_watermark = False
+            if since:
+                fresh = [c for c in comments_raw if c.get("created_time", "") >= since]
+                reached_watermark = len(fresh) < len(comments_raw)
+                comments_raw = fresh
             
-            # Save to Excel using utility
-            file_path = data_paths.get_comments_file()
-            return DataFrameOperations.save_comments_to_excel(comments, file_path)
+            if comments_raw:
+                COMMENTS_PROCESSED.labels("fetched").inc(len(comments_raw))
+                yield [self._to_comment(c) for c in comments_raw]
+            if reached_watermark:
+                return
+    
+    @staticmethod
+    def _since_params(since: Optional[str]) -> Dict[str, Any]:
+        """Query parameters that fetch comments newest first, back to the `since` watermark."""
+        if not since:
+            return {}
+        return {
+            "order": "reverse_chronological",
+            "since": int(datetime.strptime(since, GRAPH_TIME_FORMAT).timestamp())
+        }
+    
+    @staticmethod
+    def _comment_edge_responses(
+        url: str,
+        params: Optional[Dict[str, Any]],
+        first_page: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Raw comments edge responses, starting from `first_page` when given."""
+        data = first_page
+        while True:
+            if data is None:
+                response = graph_client.get(url, params=params, operation="comments_page")
+                response.raise_for_status()
+                data = response.json()
+            yield data
             
+            # The next URL already carries the cursor, fields and token
+            url = data.get("paging", {}).get("next")
+            if not url:
+                return
+            params = None
+            data = None
+    
+    def iter_comment_pages(
+        self,
+        post_id: str,
+        page_size: int = COMMENT_PAGE_SIZE,
+        prefetch: int = 1,
+        max_comments: Optional[int] = None,
+        first_page: Optional[Dict[str, Any]] = None,
+        since: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream every comment of a post, one Graph API page at a time.
+        
+        A background thread fetches up to `prefetch` pages ahead, so the caller
+        can work on page N while page N+1 is in flight. At most
+        `prefetch + 1` pages are held in memory regardless of comment count.
+        The scrape methods only overlap this with storing pages;
+        classification reads the store once the scrape has finished.
+        
+        Args:
+            post_id: Post id without the page prefix
+            page_size: Comments requested per Graph API call
+            prefetch: Pages fetched ahead of the consumer (0 disables the thread)
+            max_comments: Stop after this many comments (None or 0 for all)
+            first_page: Already fetched first page of the comments edge
+            since: Only fetch comments created at or after this `created_time`
+        """
+        max_comments = max_comments or config.max_comments
+        pages = self._fetch_comment_pages(post_id, page_size, first_page, since)
+        if prefetch > 0:
+            pages = self._prefetch_pages(pages, prefetch)
+        
+        seen = 0
+        try:
+            for page in pages:
+                if max_comments:
+                    page = page[:max_comments - seen]
+                seen += len(page)
+                yield page
+                if max_comments and seen >= max_comments:
+                    break
         except requests.exceptions.RequestException as e:
-            ErrorHandler.handle_request_error(e, "scrape_comments")
+            ErrorHandler.handle_request_error(e, "iter_comment_pages")
             raise
+        finally:
+            pages.close()
     
-    def scrape_comments_in_memory(self, post_id: str) -> List[Dict[str, str]]:
-        """Scrape comments and return in-memory (no file I/O)."""
-        url = f"{self.base_url}/{self.page_id}_{post_id}"
+    @staticmethod
+    def _prefetch_pages(pages: Iterator[List[Dict[str, Any]]], prefetch: int) -> Iterator[List[Dict[str, Any]]]:
+        """Run a page generator on a background thread behind a bounded queue."""
+        buffer = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                for page in pages:
+                    if not put(page):
+                        return
+                put(_PAGE_DONE)
+            except Exception as e:
+                put(e)
+            finally:
+                pages.close()
+        
+        worker = threading.Thread(target=produce, name="fb-comment-prefetch", daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is _PAGE_DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+    
+    def scrape_comments(self, post_id: str, incremental: bool = False) -> int:
+        """
+        Scrape comments for a specific post into the comment store.
+        
+        With `incremental`, only comments newer than the post's stored
+        watermark are fetched and appended; a post that was never scraped is
+        fetched in full. Returns the number of newly stored comments.
+        """
+        with timed("fetch"):
+            since = comment_store.get_watermark(post_id) if incremental else None
+            pages = self.iter_comment_pages(post_id, since=since)
+            return comment_store.write_comments(
+                post_id, (c for page in pages for c in page), replace=not since
+            )
+    
+    def _batch_first_pages(
+        self,
+        post_ids: List[str],
+        page_size: int,
+        watermarks: Optional[Dict[str, Optional[str]]] = None
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        First comment page of every post via Graph API batch requests.
+        
+        Up to GRAPH_BATCH_LIMIT posts share one round trip. Posts with a
+        watermark get their newest comments since it, as in an incremental
+        scrape. Posts whose sub-request failed map to None so callers can
+        fall back to a plain fetch.
+        """
+        first_pages: Dict[str, Optional[Dict[str, Any]]] = {}
+        watermarks = watermarks or {}
+        
+        for start in range(0, len(post_ids), GRAPH_BATCH_LIMIT):
+            chunk = post_ids[start:start + GRAPH_BATCH_LIMIT]
+            batch = []
+            for post_id in chunk:
+                query = urlencode({
+                    "fields": COMMENT_FIELDS, "limit": page_size,
+                    **self._since_params(watermarks.get(post_id))
+                })
+                batch.append({"method": "GET", "relative_url": f"{self.page_id}_{post_id}/comments?{query}"})
+            try:
+                response = graph_client.post(
+                    f"{self.base_url}/",
+                    data={
+                        "access_token": self.access_token,
+                        "batch": json.dumps(batch),
+                        "include_headers": "false"
+                    },
+                    operation="comments_batch"
+                )
+                response.raise_for_status()
+                results = response.json()
+            except requests.exceptions.RequestException as e:
+                ErrorHandler.handle_request_error(e, "_batch_first_pages")
+                raise
+            
+            for post_id, result in zip(chunk, results):
+                # A null entry means the sub-request timed out on Graph's side
+                if not result or result.get("code") != 200:
+                    code = result.get("code") if result else "timeout"
+                    logger.warning(f"Batch comments request for post {post_id} failed ({code})")
+                    first_pages[post_id] = None
+                    continue
+                first_pages[post_id] = json.loads(result.get("body") or "{}")
+        
+        return first_pages
+    
+    def scrape_posts(self, post_ids: List[str], page_size: int = COMMENT_PAGE_SIZE) -> Dict[str, int]:
+        """
+        Scrape comments for many posts into the comment store.
+        
+        First pages for all posts arrive in one batch call per 50 posts; only
+        posts with more comments than fit in a page need follow-up requests.
+        Like `scrape_comments(incremental=True)`, posts scraped before only
+        fetch and append comments newer than their watermark, so their labels
+        and counts are kept. Returns the newly stored comment count per post.
+        """
+        with timed("fetch_batch"):
+            watermarks = {post_id: comment_store.get_watermark(post_id) for post_id in post_ids}
+            first_pages = self._batch_first_pages(post_ids, page_size, watermarks)
+            totals = {}
+            for post_id in post_ids:
+                since = watermarks[post_id]
+                pages = self.iter_comment_pages(
+                    post_id, page_size, first_page=first_pages.get(post_id), since=since
+                )
+                totals[post_id] = comment_store.write_comments(
+                    post_id, (c for page in pages for c in page), replace=not since
+                )
+            return totals
+    
+    def scrape_recent_posts(self, limit: int = 20, page_size: int = COMMENT_PAGE_SIZE) -> Dict[str, int]:
+        """
+        Scrape comments for the page's most recent posts.
+        
+        Field expansion returns the posts together with their first comment
+        page, so a typical dashboard refresh is a single round trip. Posts
+        scraped before are updated incrementally, as in `scrape_posts`.
+        """
+        url = f"{self.base_url}/{self.page_id}/posts"
         params = {
-            "fields": "comments.limit(100){from{id,name,link},message,created_time,like_count}",
-            "access_token": self.access_token
+            "fields": f"id,comments.limit({page_size}){{{COMMENT_FIELDS}}}",
+            "access_token": self.access_token,
+            "limit": limit
         }
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = graph_client.get(url, params=params, operation="recent_posts_with_comments")
             response.raise_for_status()
             data = response.json()
-            
-            comments_raw = data.get("comments", {}).get("data", [])
-            return [{"Comments": c.get("message", "")} for c in comments_raw]
-            
         except requests.exceptions.RequestException as e:
-            ErrorHandler.handle_request_error(e, "scrape_comments_in_memory")
+            ErrorHandler.handle_request_error(e, "scrape_recent_posts")
             raise
+        
+        totals = {}
+        for post in data.get("data", []):
+            post_id_full = post.get("id", "")
+            post_id = post_id_full.split("_")[1] if "_" in post_id_full else post_id_full
+            first_page = post.get("comments", {"data": []})
+            since = comment_store.get_watermark(post_id)
+            if since and first_page.get("paging", {}).get("next"):
+                # The expanded page is oldest first; with more pages behind it, fetch newest first instead
+                first_page = None
+            pages = self.iter_comment_pages(post_id, page_size, first_page=first_page, since=since)
+            totals[post_id] = comment_store.write_comments(
+                post_id, (c for page in pages for c in page), replace=not since
+            )
+        return totals
+    
+    def scrape_comments_in_memory(self, post_id: str) -> List[Dict[str, Any]]:
+        """Scrape all comments and return in-memory (no file I/O)."""
+        comments = []
+        for page in self.iter_comment_pages(post_id):
+            comments.extend(page)
+        return comments
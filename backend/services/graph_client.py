@@ -0,0 +1,160 @@
+"""Shared, pooled HTTP client for Graph API calls."""
+import json
+import random
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from services.metrics import EXTERNAL_ERRORS, EXTERNAL_SECONDS
+from utils import config, logger
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Graph API error codes that mean "throttled", returned with 4xx statuses
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613, 80001, 80004}
+USAGE_HEADERS = ("X-App-Usage", "X-Page-Usage", "X-Business-Use-Case-Usage")
+USAGE_WARNING_PERCENT = 90
+
+
+class GraphHTTPClient:
+    """
+    One keep-alive session shared by every Graph API caller.
+    
+    Connections are pooled per host (bounded by `pool_size`), throttling and
+    transient server errors are retried with exponential backoff and jitter,
+    and Graph's `Retry-After` / usage headers are honoured when present.
+    Each call's latency is logged.
+    """
+    
+    def __init__(self, pool_size: int, max_retries: int, timeout: float,
+                 backoff_base: float, backoff_max: float):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        return self.request("GET", url, params=params, **kwargs)
+    
+    def post(self, url: str, data: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        return self.request("POST", url, data=data, **kwargs)
+    
+    def request(self, method: str, url: str, operation: str = "graph", **kwargs) -> requests.Response:
+        """Send a request, retrying throttled and transient failures."""
+        kwargs.setdefault("timeout", self.timeout)
+        path = urlsplit(url).path
+        
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                EXTERNAL_ERRORS.labels("graph", type(e).__name__).inc()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                logger.warning(f"Graph {operation} {method} {path} failed after {elapsed_ms:.0f}ms: {type(e).__name__}")
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            EXTERNAL_SECONDS.labels("graph", operation).observe(elapsed_ms / 1000)
+            if response.status_code >= 400:
+                EXTERNAL_ERRORS.labels("graph", str(response.status_code)).inc()
+            logger.info(
+                f"Graph {operation} {method} {path} -> {response.status_code} "
+                f"in {elapsed_ms:.0f}ms (attempt {attempt + 1})"
+            )
+            self._check_usage(response, operation)
+            
+            if attempt < self.max_retries and self._should_retry(response):
+                delay = self._retry_delay(response, attempt)
+                logger.warning(f"Graph {operation} throttled or failed ({response.status_code}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            return response
+        
+        return response
+    
+    @staticmethod
+    def _should_retry(response: requests.Response) -> bool:
+        if response.status_code in RETRY_STATUSES:
+            return True
+        if response.status_code in (400, 403):
+            try:
+                code = response.json().get("error", {}).get("code")
+            except ValueError:
+                return False
+            return code in RATE_LIMIT_ERROR_CODES
+        return False
+    
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+    
+    def _retry_delay(self, response: requests.Response, attempt: int) -> float:
+        """Prefer the server's own hint over exponential backoff."""
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        
+        regain_minutes = _regain_access_minutes(response.headers.get("X-Business-Use-Case-Usage"))
+        if regain_minutes:
+            return min(self.backoff_max, regain_minutes * 60)
+        
+        return self._backoff(attempt)
+    
+    @staticmethod
+    def _check_usage(response: requests.Response, operation: str) -> None:
+        for header in USAGE_HEADERS:
+            usage = _max_usage_percent(response.headers.get(header))
+            if usage >= USAGE_WARNING_PERCENT:
+                logger.warning(f"Graph {operation}: {header} at {usage}% of the rate limit")
+
+
+def _usage_entries(raw: Optional[str]) -> list:
+    """Flatten Graph usage headers: a single object, or {business_id: [objects]}."""
+    if not raw:
+        return []
+    try:
+        usage = json.loads(raw)
+    except ValueError:
+        return []
+    if not isinstance(usage, dict):
+        return []
+    if any(isinstance(v, list) for v in usage.values()):
+        return [entry for v in usage.values() if isinstance(v, list) for entry in v if isinstance(entry, dict)]
+    return [usage]
+
+
+def _max_usage_percent(raw: Optional[str]) -> float:
+    percents = [
+        value for entry in _usage_entries(raw)
+        for key, value in entry.items()
+        if key in ("call_count", "total_cputime", "total_time") and isinstance(value, (int, float))
+    ]
+    return max(percents, default=0)
+
+
+def _regain_access_minutes(raw: Optional[str]) -> float:
+    minutes = [
+        entry.get("estimated_time_to_regain_access", 0) for entry in _usage_entries(raw)
+        if isinstance(entry.get("estimated_time_to_regain_access", 0), (int, float))
+    ]
+    return max(minutes, default=0)
+
+
+graph_client = GraphHTTPClient(
+    pool_size=config.graph_pool_size,
+    max_retries=config.graph_max_retries,
+    timeout=config.graph_timeout,
+    backoff_base=config.graph_backoff_base,
+    backoff_max=config.graph_backoff_max
+)
@@ -0,0 +1,206 @@
+"""Multi-process sentiment inference: each worker process owns a model copy."""
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+from utils import logger
+
+# Sent by a worker as (None, status, detail) once its model is usable or failed to load
+_READY = "ready"
+_FAILED = "failed"
+
+
+def _worker_main(pipeline_factory: Callable, engine_options: Dict[str, Any], warm_up: List[str],
+                 batch_window: float, max_batch: int, requests, results) -> None:
+    """
+    Worker loop: load the model once, then serve requests from the shared queue.
+
+    After taking a request the worker keeps draining the queue for up to
+    `batch_window` seconds (or `max_batch` texts) and runs everything it
+    collected as one length-bucketed pass, so small requests from different
+    callers share forward passes.
+    """
+    from services.sentiment_engine import SentimentEngine
+
+    try:
+        engine = SentimentEngine(pipeline_factory(), **engine_options)
+        engine.classify(warm_up)
+    except Exception as e:
+        results.put((None, _FAILED, repr(e)))
+        return
+    results.put((None, _READY, os.getpid()))
+
+    stopping = False
+    while not stopping:
+        item = requests.get()
+        if item is None:
+            return
+        batch = [item]
+        size = len(item[1])
+        deadline = time.monotonic() + batch_window
+        while size < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+            size += len(item[1])
+
+        try:
+            outputs = engine.classify([text for _, texts in batch for text in texts])
+        except Exception as e:
+            for request_id, _ in batch:
+                results.put((request_id, "error", repr(e)))
+            continue
+        offset = 0
+        for request_id, texts in batch:
+            results.put((request_id, "ok", outputs[offset:offset + len(texts)]))
+            offset += len(texts)
+
+
+class InferencePool:
+    """
+    Shards classification requests across worker processes.
+
+    Each call is split into shards that go onto one shared queue, so
+    concurrent callers interleave instead of queueing behind each other,
+    and a large call is spread over every worker. A collector thread routes
+    results back to per-shard futures; `classify` reassembles them in input
+    order, matching SentimentEngine.classify.
+
+    A worker that dies is replaced, and the requests in flight at that time
+    fail rather than hang.
+    """
+
+    def __init__(self, pipeline_factory: Callable, workers: int, engine_options: Dict[str, Any],
+                 warm_up: List[str], batch_window_ms: float = 5, max_batch: int = 256):
+        self.pipeline_factory = pipeline_factory
+        self.workers = workers
+        self.engine_options = engine_options
+        self.warm_up = warm_up
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        # Spawned, not forked: the parent may already hold threads and a loaded model
+        self._context = multiprocessing.get_context("spawn")
+        self._requests = self._context.Queue()
+        self._results = self._context.Queue()
+        self._processes: List[multiprocessing.Process] = []
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._collector = None
+        self._running = False
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.pipeline_factory, self.engine_options, self.warm_up, self.batch_window, self.max_batch,
+                  self._requests, self._results),
+            name="sentiment-worker",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def start(self, timeout: float = 900) -> None:
+        """Start the workers and block until every one has loaded its model."""
+        self._processes = [self._spawn() for _ in range(self.workers)]
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.workers:
+            try:
+                _, status, detail = self._results.get(timeout=max(0.1, deadline - time.monotonic()))
+            except queue.Empty:
+                self.stop()
+                raise RuntimeError(f"Inference workers not ready after {timeout}s")
+            if status == _FAILED:
+                self.stop()
+                raise RuntimeError(f"Inference worker failed to load the model: {detail}")
+            ready += 1
+
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="inference-collector", daemon=True)
+        self._collector.start()
+        logger.info(f"Inference pool ready with {self.workers} workers")
+
+    def stop(self) -> None:
+        self._running = False
+        for _ in self._processes:
+            self._requests.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._fail_pending(RuntimeError("Inference pool stopped"))
+
+    def classify(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Return one `{"label", "score"}` result per text, in input order."""
+        if not texts:
+            return []
+        if not self._running:
+            raise RuntimeError("Inference pool is not running")
+
+        shard_size = min(self.max_batch, max(self.engine_options.get("batch_size", 32),
+                                             math.ceil(len(texts) / self.workers)))
+        futures = []
+        for start in range(0, len(texts), shard_size):
+            future = Future()
+            request_id = next(self._ids)
+            with self._lock:
+                self._pending[request_id] = future
+            self._requests.put((request_id, texts[start:start + shard_size]))
+            futures.append(future)
+        return [result for future in futures for result in future.result()]
+
+    def _collect(self) -> None:
+        next_check = time.monotonic() + 1
+        while self._running:
+            if time.monotonic() >= next_check:
+                self._replace_dead_workers()
+                next_check = time.monotonic() + 1
+            try:
+                request_id, status, detail = self._results.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if request_id is None:
+                if status == _FAILED:
+                    logger.error(f"Replacement inference worker failed to load the model: {detail}")
+                continue
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if status == "ok":
+                future.set_result(detail)
+            else:
+                future.set_exception(RuntimeError(f"Inference failed: {detail}"))
+
+    def _replace_dead_workers(self) -> None:
+        dead = [i for i, process in enumerate(self._processes) if not process.is_alive()]
+        if not dead or not self._running:
+            return
+        logger.error(f"{len(dead)} inference worker(s) exited; restarting")
+        # Which requests the dead worker held is unknown, so fail every in-flight one
+        self._fail_pending(RuntimeError("Inference worker exited"))
+        for i in dead:
+            self._processes[i] = self._spawn()
+
+    def _fail_pending(self, error: Exception) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
@@ -0,0 +1,163 @@
+"""In-process background job queue with per-stage concurrency limits."""
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from utils import config, logger, ErrorHandler
+
+Stage = Tuple[str, Callable[[Any], Any]]
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job."""
+
+
+class Job:
+    """A unit of work that runs a fixed list of stages in order."""
+    
+    def __init__(self, stages: List[Stage], meta: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.stages = stages
+        self.meta = meta or {}
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # Bumped on every change so watchers can detect updates cheaply
+        self.version = 0
+    
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "jobId": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": [name for name, _ in self.stages],
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+            **self.meta,
+        }
+        if self.status == "completed":
+            data["result"] = self.result
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """
+    Runs jobs on a fixed pool of worker threads without an external broker.
+    
+    Each stage name has its own semaphore, so e.g. model inference can be
+    limited to one job at a time while Graph API fetches run in parallel.
+    Finished jobs are kept for `ttl_seconds` so clients can collect results.
+    """
+    
+    def __init__(self, workers: int, stage_limits: Dict[str, int], max_queued: int, ttl_seconds: int):
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max_queued)
+        self._stage_slots = {name: threading.BoundedSemaphore(limit) for name, limit in stage_limits.items()}
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+    
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Job queue started with {self.workers} workers")
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+    
+    def submit(self, stages: List[Stage], meta: Optional[Dict[str, Any]] = None) -> Job:
+        self.start()
+        self._prune()
+        job = Job(stages, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFullError("Too many jobs queued, try again later")
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def snapshot(self, job: Job) -> Tuple[int, Dict[str, Any]]:
+        """A consistent (version, state) pair for a job."""
+        with self._lock:
+            return job.version, job.to_dict()
+    
+    def _update(self, job: Job, **changes) -> None:
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            job.version += 1
+    
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run(job)
+    
+    def _run(self, job: Job) -> None:
+        self._update(job, status="running")
+        value = None
+        try:
+            for name, fn in job.stages:
+                self._update(job, stage=name)
+                slot = self._stage_slots.get(name)
+                if slot is None:
+                    value = fn(value)
+                    continue
+                with slot:
+                    value = fn(value)
+            self._update(job, status="completed", stage=None, result=value)
+        except Exception as e:
+            ErrorHandler.handle_request_error(e, f"job {job.id} stage {job.stage}")
+            # Exception text can carry request URLs with access tokens; clients only see the stage
+            self._update(job, status="failed", error=f"{job.stage} failed")
+    
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [jid for jid, job in self._jobs.items() if job.done and job.updated_at < cutoff]
+            for jid in expired:
+                del self._jobs[jid]
+
+
+job_queue = JobQueue(
+    workers=config.job_workers,
+    stage_limits={
+        "fetch": config.job_fetch_concurrency,
+        "classify": config.job_classify_concurrency,
+        "takeaways": config.job_takeaway_concurrency,
+    },
+    max_queued=config.job_queue_size,
+    ttl_seconds=config.job_ttl_seconds
+)
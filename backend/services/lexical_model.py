@@ -0,0 +1,198 @@
+"""
+Linear sentiment model over hashed text features, the cheap first tier of the
+classification cascade.
+
+It is trained offline on labels the transformer already produced, so it
+learns to imitate the transformer rather than a separate ground truth.
+Comments it is confident about keep its label; the rest escalate to the
+transformer. Train it from a store labelled with the cascade off, or from an
+exported file, so it never learns from its own earlier answers.
+
+Usage:
+    python -m services.lexical_model --output data/lexical_model.npz
+    python -m services.lexical_model --input labelled.jsonl --output data/lexical_model.npz
+"""
+import argparse
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from services.text_features import hashed_sparse
+from utils import logger
+
+N_FEATURES = 2 ** 18
+# About the transformer's 128-token input window
+MAX_CHARS = 512
+
+
+def _scores(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_rows: int, weights: np.ndarray) -> np.ndarray:
+    """Sparse features times the weight matrix, one bincount per class."""
+    return np.stack([
+        np.bincount(rows, weights=values * weights[cols, k], minlength=n_rows) for k in range(weights.shape[1])
+    ], axis=1)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class LexicalModel:
+    """
+    Multinomial logistic regression on hashed word and bigram counts.
+
+    `labels` are the transformer's own labels (POS/NEG/NEU), so predictions
+    go through LABEL_MAP like any pipeline result.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: Sequence[str],
+                 n_features: int = N_FEATURES, max_chars: int = MAX_CHARS):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.labels = tuple(labels)
+        self.n_features = n_features
+        self.max_chars = max_chars
+
+    @classmethod
+    def train(cls, texts: List[str], labels: List[str], n_features: int = N_FEATURES, max_chars: int = MAX_CHARS,
+              epochs: int = 200, learning_rate: float = 0.1, l2: float = 1e-6) -> "LexicalModel":
+        """Fit by full-batch Adam on the cross-entropy; features stay sparse throughout."""
+        classes = sorted(set(labels))
+        index = {label: k for k, label in enumerate(classes)}
+        targets = np.zeros((len(texts), len(classes)), dtype=np.float32)
+        targets[np.arange(len(texts)), [index[label] for label in labels]] = 1.0
+        rows, cols, values = hashed_sparse(texts, n_features, max_chars)
+
+        params = [np.zeros((n_features, len(classes)), dtype=np.float32), np.zeros(len(classes), dtype=np.float32)]
+        moments = [np.zeros_like(p) for p in params]
+        velocities = [np.zeros_like(p) for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            weights, bias = params
+            error = (_softmax(_scores(rows, cols, values, len(texts), weights) + bias) - targets) / len(texts)
+            grad_weights = np.stack([
+                np.bincount(cols, weights=values * error[rows, k], minlength=n_features)
+                for k in range(len(classes))
+            ], axis=1) + l2 * weights
+            grads = [grad_weights, error.sum(axis=0)]
+            for p, g, m, v in zip(params, grads, moments, velocities):
+                m *= beta1
+                m += (1 - beta1) * g
+                v *= beta2
+                v += (1 - beta2) * g * g
+                p -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+        return cls(params[0], params[1], classes, n_features, max_chars)
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """Class probabilities, one row per text, columns in `labels` order."""
+        rows, cols, values = hashed_sparse(texts, self.n_features, self.max_chars)
+        return _softmax(_scores(rows, cols, values, len(texts), self.weights) + self.bias)
+
+    def predict(self, texts: List[str]) -> Tuple[List[Dict[str, float]], np.ndarray]:
+        """Pipeline-shaped `{"label", "score"}` results plus each text's confidence."""
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(texts)), best]
+        return [{"label": self.labels[k], "score": float(p)} for k, p in zip(best, confidence)], confidence
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Only the buckets that were ever hit carry weight; storing those keeps the file small
+        used = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f, used=used, weights=self.weights[used], bias=self.bias, labels=np.array(self.labels),
+                n_features=self.n_features, max_chars=self.max_chars
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalModel":
+        with np.load(path) as data:
+            n_features = int(data["n_features"])
+            weights = np.zeros((n_features, len(data["labels"])), dtype=np.float32)
+            weights[data["used"]] = data["weights"]
+            return cls(weights, data["bias"], [str(label) for label in data["labels"]],
+                       n_features, int(data["max_chars"]))
+
+
+class CascadeStats:
+    """Running escalation and audit-agreement counts for /cache/stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.considered = 0
+        self.escalated = 0
+        self.audited = 0
+        self.agreed = 0
+
+    def record(self, considered: int, escalated: int, audited: int = 0, agreed: int = 0) -> None:
+        with self._lock:
+            self.considered += considered
+            self.escalated += escalated
+            self.audited += audited
+            self.agreed += agreed
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "considered": self.considered,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.considered, 3) if self.considered else 0.0,
+                "audited": self.audited,
+                "audit_agreement": round(self.agreed / self.audited, 3) if self.audited else None,
+            }
+
+
+cascade_stats = CascadeStats()
+
+
+def _read_labelled(path: Path) -> Tuple[List[str], List[str]]:
+    """(text, label) pairs from a JSONL file with `text` and `label` fields."""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record["text"])
+                labels.append(record["label"])
+    return texts, labels
+
+
+def main():
+    from controllers.classify import LABEL_MAP
+    from services.comment_store import comment_store
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path,
+                        help="JSONL of transformer-labelled comments; defaults to the labels in the comment store")
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=0, help="use at most this many labelled comments")
+    args = parser.parse_args()
+
+    if args.input:
+        texts, labels = _read_labelled(args.input)
+    else:
+        pairs = comment_store.load_labelled(args.limit or None)
+        texts = [message for message, _ in pairs]
+        labels = [label for _, label in pairs]
+    if args.limit:
+        texts, labels = texts[:args.limit], labels[:args.limit]
+    # Training targets are pipeline labels, whichever form the source uses
+    to_pipeline = {name: label for label, name in LABEL_MAP.items()}
+    labels = [to_pipeline.get(label, label) for label in labels]
+    if len(set(labels)) < 2:
+        raise SystemExit("Need labelled comments from at least two classes to train")
+
+    start = time.perf_counter()
+    model = LexicalModel.train(texts, labels, epochs=args.epochs)
+    model.save(args.output)
+    agreement = float(np.mean([r["label"] == label for r, label in zip(model.predict(texts)[0], labels)]))
+    logger.info(f"Trained on {len(texts)} comments in {time.perf_counter() - start:.1f}s "
+                f"(training agreement {agreement:.3f}), saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Prometheus metrics and per-stage timing spans."""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Stages run from milliseconds (cache lookups) to minutes (large inference or Gemini map-reduce)
+_STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram("sie_stage_seconds", "Time spent per pipeline stage", ["stage"], buckets=_STAGE_BUCKETS)
+REQUEST_SECONDS = Histogram(
+    "sie_http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=_STAGE_BUCKETS
+)
+EXTERNAL_SECONDS = Histogram(
+    "sie_external_request_seconds", "Latency of Graph API and Gemini calls", ["api", "operation"],
+    buckets=_STAGE_BUCKETS
+)
+EXTERNAL_ERRORS = Counter(
+    "sie_external_api_errors_total", "Failed Graph API and Gemini calls, including retried ones", ["api", "reason"]
+)
+COMMENTS_PROCESSED = Counter(
+    "sie_comments_processed_total",
+    "Comments through each step: fetched from Graph, labelled, answered by the lexical tier, "
+    "and actually sent to the model",
+    ["step"]
+)
+CASCADE_AUDITS = Counter(
+    "sie_cascade_audits_total", "Lexical-tier labels re-checked by the transformer, by outcome", ["result"]
+)
+SINGLE_FLIGHT = Counter(
+    "sie_single_flight_total",
+    "Coalescable calls by operation: `led` ran the work, `joined` shared an identical call in flight",
+    ["operation", "role"]
+)
+CACHE_EVENTS = Counter("sie_cache_events_total", "Cache lookups by outcome", ["cache", "result"])
+
+# Set per request when profiling is on; spans append (stage, seconds) to it
+_profile: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("sie_profile", default=None)
+
+
+@contextmanager
+def timed(stage: str):
+    """Record a stage's duration in the stage histogram and the active request profile."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        spans = _profile.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def start_profile() -> List[Tuple[str, float]]:
+    """Collect this request's spans; work handed to other threads is not included."""
+    spans: List[Tuple[str, float]] = []
+    _profile.set(spans)
+    return spans
+
+
+def server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    """Spans as a Server-Timing header value; repeated stages are summed (durations in ms)."""
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+        counts[stage] = counts.get(stage, 0) + 1
+    entries = [
+        f'{stage};dur={seconds * 1000:.1f}' + (f';desc="x{counts[stage]}"' if counts[stage] > 1 else "")
+        for stage, seconds in totals.items()
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,83 @@
+"""Coalesces concurrent classification calls into shared model batches."""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+from utils import logger
+
+
+class MicroBatcher:
+    """
+    Request-coalescing front for an engine's `classify(texts)`.
+
+    Callers enqueue their texts and wait on a future. A single dispatcher
+    thread takes the first waiting request, keeps collecting others for up
+    to `max_wait_ms` or until `max_items` texts are gathered, runs them as
+    one batch and hands each caller its slice. Several users with a few
+    comments each then share forward passes instead of each running a tiny
+    batch, and the model is driven by one thread at a time.
+    """
+
+    def __init__(self, classify: Callable[[List[str]], List[Dict[str, Any]]], max_wait_ms: float = 5,
+                 max_items: int = 256):
+        self._classify = classify
+        self.max_wait = max_wait_ms / 1000
+        self.max_items = max_items
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self._thread = threading.Thread(target=self._dispatch, name="sentiment-batcher", daemon=True)
+        self._thread.start()
+
+    def classify(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Return one `{"label", "score"}` result per text, in input order."""
+        if not texts:
+            return []
+        future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def _gather(self) -> list:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._gather()
+            with self._lock:
+                self.batches += 1
+                self.requests += len(batch)
+            try:
+                outputs = self._classify([text for texts, _ in batch for text in texts])
+            except Exception as e:
+                logger.error(f"Coalesced batch of {len(batch)} requests failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for texts, future in batch:
+                future.set_result(outputs[offset:offset + len(texts)])
+                offset += len(texts)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            requests, batches = self.requests, self.batches
+        return {
+            "requests": requests,
+            "batches": batches,
+            "requests_per_batch": round(requests / batches, 2) if batches else 0,
+        }
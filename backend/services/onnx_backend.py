@@ -0,0 +1,129 @@
+"""
+ONNX Runtime inference for the sentiment model, with int8 dynamic quantization.
+
+Selected with SENTIMENT_BACKEND=onnx. Requires the optional `onnx` and
+`onnxruntime` packages; torch is only needed for the one-off export.
+"""
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from services.metrics import timed
+from utils import logger
+
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+ONNX_OPSET = 17
+
+
+def export_quantized_model(model_name: str, output_dir: Path) -> Path:
+    """
+    Export the Hugging Face model to ONNX and quantize its weights to int8.
+
+    The tokenizer and config are saved alongside, so loading needs neither
+    torch nor network access. Returns the quantized model path; an existing
+    export is reused.
+    """
+    model_path = output_dir / QUANTIZED_MODEL_FILE
+    if model_path.exists():
+        return model_path
+
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    start = time.perf_counter()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+
+    fp32_path = output_dir / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            str(fp32_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET,
+        )
+    # Weights become int8, activations are quantized on the fly per batch
+    quantize_dynamic(str(fp32_path), str(model_path), weight_type=QuantType.QInt8)
+    fp32_path.unlink()
+
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    logger.info(f"Exported {model_name} to {model_path} in {time.perf_counter() - start:.1f}s")
+    return model_path
+
+
+class OnnxSentimentPipeline:
+    """
+    Drop-in replacement for the transformers sentiment pipeline.
+
+    Called with a list of texts and the same keyword arguments
+    SentimentEngine passes, it returns `{"label", "score"}` dicts using the
+    model's own labels (POS/NEG/NEU), so LABEL_MAP applies unchanged.
+    """
+
+    def __init__(self, model_dir: Path, num_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Batches run one at a time; all cores go to the operators inside them
+        options.inter_op_num_threads = 1
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            str(model_dir / QUANTIZED_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.id2label = {int(i): label for i, label in AutoConfig.from_pretrained(model_dir).id2label.items()}
+        self._input_names = {node.name for node in self.session.get_inputs()}
+
+    def __call__(self, texts: List[str], batch_size: Optional[int] = None, truncation: bool = True,
+                 max_length: Optional[int] = None, **kwargs) -> List[Dict[str, Any]]:
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or len(texts)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            with timed("tokenize"):
+                encoded = self.tokenizer(
+                    texts[start:start + batch_size],
+                    padding=True,
+                    truncation=truncation,
+                    max_length=max_length,
+                    return_tensors="np",
+                )
+            feeds = {name: array.astype(np.int64) for name, array in encoded.items() if name in self._input_names}
+            with timed("forward"):
+                logits = self.session.run(None, feeds)[0]
+
+            exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probabilities = exp / exp.sum(axis=1, keepdims=True)
+            for row in probabilities:
+                best = int(row.argmax())
+                results.append({"label": self.id2label[best], "score": float(row[best])})
+        return results
+
+
+def load_onnx_pipeline(model_name: str, model_dir: Path, num_threads: int = 0) -> OnnxSentimentPipeline:
+    """Quantized ONNX pipeline for `model_name`, exporting it on first use."""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "SENTIMENT_BACKEND=onnx needs the onnx and onnxruntime packages (pip install onnx onnxruntime)"
+        ) from e
+    export_quantized_model(model_name, model_dir)
+    return OnnxSentimentPipeline(model_dir, num_threads)
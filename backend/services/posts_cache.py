@@ -0,0 +1,134 @@
+"""Stale-while-revalidate cache for pages of a Facebook page's posts."""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from services.metrics import CACHE_EVENTS
+from utils import config, logger
+
+# fetch(etag) -> (page, etag); page is None when the source reports it unchanged
+PageFetcher = Callable[[Optional[str]], Tuple[Optional[Dict[str, Any]], Optional[str]]]
+
+
+def _digest(page: Dict[str, Any]) -> str:
+    payload = json.dumps(page, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=12).hexdigest()
+
+
+class PostsCache:
+    """
+    Posts pages keyed by page, access token, limit and cursor.
+
+    A page younger than `ttl_seconds` is served from memory. Up to
+    `stale_seconds` past that it is still served at once while one
+    background refresh runs; older pages are fetched before answering.
+    Refreshes send Graph's ETag, and a 304 or an identical body only renews
+    the entry, so its digest (the ETag given to clients) stays the same.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, stale_seconds: float, refresh_workers: int = 2):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.refresh_workers = refresh_workers
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.counts = {"hit": 0, "stale": 0, "miss": 0, "not_modified": 0, "unchanged": 0, "changed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(page_id: str, access_token: str, limit: int, after: Optional[str], before: Optional[str]) -> str:
+        # Tokens can see different posts, so they are part of the key, hashed rather than kept
+        payload = "\x1f".join([page_id, access_token, str(limit), after or "", before or ""])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, fetch: PageFetcher) -> Tuple[Dict[str, Any], str, str]:
+        """(page, digest, cache state) where the state is hit, stale, miss or bypass."""
+        if not self.enabled:
+            page, _ = fetch(None)
+            return page, _digest(page), "bypass"
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = now - entry["fetched_at"]
+                if age < self.ttl_seconds:
+                    state = "hit"
+                elif age < self.ttl_seconds + self.stale_seconds:
+                    state = "stale"
+                    if not entry["refreshing"]:
+                        entry["refreshing"] = True
+                        self._refresher().submit(self._background_refresh, key, entry, fetch)
+                else:
+                    state = "miss"
+                if state != "miss":
+                    self._count(state)
+                    return entry["page"], entry["digest"], state
+
+        with self._lock:
+            self._count("miss")
+        entry = self._refresh(key, entry, fetch)
+        return entry["page"], entry["digest"], "miss"
+
+    def _refresher(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers, thread_name_prefix="posts-refresh")
+        return self._executor
+
+    def _count(self, outcome: str) -> None:
+        """Callers hold the lock."""
+        self.counts[outcome] += 1
+        CACHE_EVENTS.labels("posts", outcome).inc()
+
+    def _refresh(self, key: str, entry: Optional[Dict[str, Any]], fetch: PageFetcher) -> Dict[str, Any]:
+        """Fetch conditionally against `entry` and store the result."""
+        page, etag = fetch(entry["etag"] if entry else None)
+        if entry is not None and page is None:
+            outcome, page, etag = "not_modified", entry["page"], entry["etag"]
+        elif entry is not None and _digest(page) == entry["digest"]:
+            outcome, page = "unchanged", entry["page"]
+        else:
+            outcome = "changed"
+
+        fresh = {"page": page, "digest": entry["digest"] if outcome != "changed" else _digest(page),
+                 "etag": etag, "fetched_at": time.time(), "refreshing": False}
+        with self._lock:
+            self._count(outcome)
+            self._entries[key] = fresh
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fresh
+
+    def _background_refresh(self, key: str, entry: Dict[str, Any], fetch: PageFetcher) -> None:
+        try:
+            self._refresh(key, entry, fetch)
+        except Exception as e:
+            # Keep serving the stale page; the next request past the TTL tries again
+            logger.warning(f"Background posts refresh failed: {e}")
+            with self._lock:
+                entry["refreshing"] = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            served = self.counts["hit"] + self.counts["stale"] + self.counts["miss"]
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_seconds": self.stale_seconds,
+                **self.counts,
+                "hit_rate": round((self.counts["hit"] + self.counts["stale"]) / served, 4) if served else 0
+            }
+
+
+posts_cache = PostsCache(config.posts_cache_size, config.posts_cache_ttl, config.posts_cache_stale)
@@ -0,0 +1,177 @@
+"""Content-addressed cache for sentiment results."""
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from utils import config, data_paths, ErrorHandler
+
+# SQLite's default limit on bound parameters per statement is 999
+_SQL_CHUNK = 500
+# Stored rows between checks of the persistent tier's row cap
+_PRUNE_EVERY = 1000
+
+
+def normalize_comment(text: str) -> str:
+    """Canonical form used for cache keys: NFKC with collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class SentimentCache:
+    """
+    Two-tier cache of pipeline results keyed by normalized text and model name.
+    
+    The memory tier is a bounded LRU. The optional SQLite tier survives
+    restarts; hits there are promoted into memory. It keeps at most about
+    `max_rows` rows (0 for no limit), dropping the oldest written first.
+    """
+    
+    def __init__(self, max_entries: int, db_path: Optional[Path] = None, max_rows: int = 0):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._unpruned_rows = 0
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.pruned = 0
+        
+        if db_path is not None:
+            with closing(self._connect()) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS sentiment_cache "
+                    "(key TEXT PRIMARY KEY, label TEXT NOT NULL, score REAL NOT NULL)"
+                )
+            self._prune()
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    @staticmethod
+    def make_key(text: str, model_name: str) -> str:
+        payload = f"{model_name}\x1f{normalize_comment(text)}".encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+    
+    def lookup(self, texts: List[str], model_name: str) -> List[Optional[Dict[str, Any]]]:
+        """Return the cached result for each text, or None where it is missing."""
+        keys = [self.make_key(t, model_name) for t in texts]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = entry
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+        
+        if missing and self.db_path is not None:
+            for key, entry in self._load_persistent(list(missing)).items():
+                for i in missing.pop(key):
+                    results[i] = entry
+                self._remember(key, entry)
+                with self._lock:
+                    self.persistent_hits += 1
+        
+        with self._lock:
+            self.misses += sum(len(positions) for positions in missing.values())
+        return results
+    
+    def store(self, texts: List[str], results: List[Dict[str, Any]], model_name: str) -> None:
+        rows = []
+        for text, result in zip(texts, results):
+            key = self.make_key(text, model_name)
+            entry = {"label": result["label"], "score": float(result["score"])}
+            self._remember(key, entry)
+            rows.append((key, entry["label"], entry["score"]))
+        
+        if rows and self.db_path is not None:
+            try:
+                with closing(self._connect()) as conn, conn:
+                    # REPLACE gives rewritten rows a new rowid, so rowid order is write order
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO sentiment_cache (key, label, score) VALUES (?, ?, ?)", rows
+                    )
+            except sqlite3.Error as e:
+                # The cache is an optimisation; never fail a request over it
+                ErrorHandler.handle_data_error(e, "sentiment_cache.store")
+                return
+            
+            with self._lock:
+                self._unpruned_rows += len(rows)
+                due = self._unpruned_rows >= _PRUNE_EVERY
+                if due:
+                    self._unpruned_rows = 0
+            if due:
+                self._prune()
+    
+    def _prune(self) -> None:
+        """Delete the oldest persistent rows beyond `max_rows`."""
+        if not self.max_rows:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                deleted = conn.execute(
+                    "DELETE FROM sentiment_cache WHERE rowid <= "
+                    "(SELECT rowid FROM sentiment_cache ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                    (self.max_rows,)
+                ).rowcount
+        except sqlite3.Error as e:
+            ErrorHandler.handle_data_error(e, "sentiment_cache.prune")
+            return
+        with self._lock:
+            self.pruned += deleted
+    
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _load_persistent(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        try:
+            with closing(self._connect()) as conn:
+                for start in range(0, len(keys), _SQL_CHUNK):
+                    chunk = keys[start:start + _SQL_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, label, score FROM sentiment_cache WHERE key IN ({placeholders})", chunk
+                    )
+                    for key, label, score in rows:
+                        found[key] = {"label": label, "score": score}
+        except sqlite3.Error as e:
+            ErrorHandler.handle_data_error(e, "sentiment_cache.lookup")
+        return found
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self.db_path is not None,
+                "max_rows": self.max_rows,
+                "pruned": self.pruned,
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0
+            }
+
+
+sentiment_cache = SentimentCache(
+    config.sentiment_cache_size,
+    data_paths.get_sentiment_cache_file() if config.sentiment_cache_persist else None,
+    config.sentiment_cache_max_rows
+)
@@ -0,0 +1,72 @@
+"""Batched, length-bucketed sentiment inference."""
+from typing import Any, Dict, List, Optional
+from utils import config, logger
+
+MODEL_NAME = "finiteautomata/bertweet-base-sentiment-analysis"
+SENTIMENT_BACKENDS = ("torch", "onnx")
+
+
+def model_tag(backend: str) -> str:
+    """Cache namespace for a backend; quantized scores differ slightly from torch's."""
+    return MODEL_NAME if backend == "torch" else f"{MODEL_NAME}:{backend}-int8"
+
+
+def build_pipeline(backend: str, num_threads: int = 0):
+    """The sentiment pipeline for a backend: the transformers pipeline or the ONNX Runtime one."""
+    if backend not in SENTIMENT_BACKENDS:
+        raise ValueError(f"Unknown SENTIMENT_BACKEND {backend!r}; expected one of {', '.join(SENTIMENT_BACKENDS)}")
+    if backend == "onnx":
+        from services.onnx_backend import load_onnx_pipeline
+        from utils import data_paths
+        return load_onnx_pipeline(MODEL_NAME, data_paths.get_onnx_model_dir(MODEL_NAME), num_threads)
+    from transformers import pipeline
+    configure_cpu_threads(num_threads)
+    return pipeline("sentiment-analysis", model=MODEL_NAME)
+
+
+def configure_cpu_threads(num_threads: int) -> None:
+    """Pin torch's intra-op thread pool; 0 keeps torch's default."""
+    if num_threads <= 0:
+        return
+    import torch
+    if torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+        logger.info(f"Torch intra-op threads set to {num_threads}")
+
+
+class SentimentEngine:
+    """
+    Runs a text-classification pipeline over many comments efficiently.
+    
+    Comments are sorted by length and cut into fixed-size batches, so every
+    batch holds similarly sized inputs and padding stays minimal. Character
+    length is used as the sort key: it tracks token length closely and costs
+    nothing to compute. Inputs longer than `max_length` tokens are truncated
+    instead of failing. Results come back in the caller's order.
+    """
+    
+    def __init__(self, pipeline, batch_size: Optional[int] = None, max_length: Optional[int] = None):
+        self.pipeline = pipeline
+        self.batch_size = batch_size or config.sentiment_batch_size
+        self.max_length = max_length or config.sentiment_max_length
+    
+    def classify(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Return one `{"label", "score"}` result per text, in input order."""
+        if not texts:
+            return []
+        
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        
+        for start in range(0, len(order), self.batch_size):
+            bucket = order[start:start + self.batch_size]
+            outputs = self.pipeline(
+                [texts[i] for i in bucket],
+                batch_size=len(bucket),
+                truncation=True,
+                max_length=self.max_length
+            )
+            for i, output in zip(bucket, outputs):
+                results[i] = output
+        
+        return results
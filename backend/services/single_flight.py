@@ -0,0 +1,77 @@
+"""Single-flight coalescing: concurrent identical calls share one execution."""
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+from services.metrics import SINGLE_FLIGHT
+
+T = TypeVar("T")
+
+# (page id, post id, operation); the post part may be any hashable, e.g. a tuple of post ids
+# or (post id, credential digest)
+FlightKey = Tuple[str, Hashable, str]
+
+
+def credential_digest(secret: str) -> str:
+    """Hash of an access token or API key, so keys keep callers apart without holding the secret."""
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.joined = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    The first caller for a key runs the work; callers arriving while it is
+    in flight wait and receive the same result, or the same exception. The
+    key is forgotten as soon as the call finishes, so nothing is cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[FlightKey, _Flight] = {}
+        self.led = 0
+        self.joined = 0
+
+    def do(self, key: FlightKey, fn: Callable[[], T]) -> T:
+        operation = key[2]
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.led += 1
+            else:
+                flight.joined += 1
+                self.joined += 1
+        SINGLE_FLIGHT.labels(operation, "led" if leader else "joined").inc()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._flights), "led": self.led, "joined": self.joined}
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,211 @@
+"""Cache for Gemini takeaways keyed by a fingerprint of the prompt inputs."""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional
+from utils import config, data_paths, ErrorHandler
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS takeaway_cache (
+    key TEXT PRIMARY KEY,
+    scope TEXT,
+    model_tag TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    takeaways TEXT NOT NULL,
+    fingerprints TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_takeaway_scope ON takeaway_cache (scope, model_tag, created_at);
+"""
+
+
+def comment_fingerprints(positive: List[str], negative: List[str]) -> FrozenSet[str]:
+    """Short per-comment hashes used to measure how much a comment set changed."""
+    return frozenset(
+        hashlib.blake2b(f"{side}\x1f{comment}".encode("utf-8"), digest_size=8).hexdigest()
+        for side, comments in (("p", positive), ("n", negative))
+        for comment in comments
+    )
+
+
+def changed_ratio(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Share of comments present in only one of the two sets."""
+    union = len(a | b)
+    return len(a ^ b) / union if union else 0.0
+
+
+class TakeawayCache:
+    """
+    Takeaways keyed by a hash of the exact prompt inputs, model name and
+    prompt version, with TTL and size-bounded LRU eviction.
+    
+    Entries may carry a scope (e.g. a post id). For a scope, the latest
+    entry can be reused when the comment set changed only slightly.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: int, db_path: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._latest_by_scope: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        
+        if db_path is not None:
+            with closing(self._connect()) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    @staticmethod
+    def make_key(positive: List[str], negative: List[str], model_tag: str) -> str:
+        payload = json.dumps([model_tag, positive, negative], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["created_at"] < self.ttl_seconds
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Takeaways for an exact input fingerprint, or None."""
+        entry = self._get_entry(key)
+        with self._lock:
+            if entry is not None:
+                self.hits += 1
+                return entry["takeaways"]
+            return None
+    
+    def find_similar(self, scope: str, model_tag: str, fingerprints: FrozenSet[str],
+                     max_changed_ratio: float) -> Optional[Dict[str, Any]]:
+        """Latest takeaways for `scope` whose comment set differs by at most `max_changed_ratio`."""
+        if max_changed_ratio <= 0:
+            return None
+        
+        with self._lock:
+            key = self._latest_by_scope.get((scope, model_tag))
+        entry = self._get_entry(key) if key else self._load_latest(scope, model_tag)
+        
+        if entry is None or changed_ratio(entry["fingerprints"], fingerprints) > max_changed_ratio:
+            return None
+        with self._lock:
+            self.near_hits += 1
+        return entry["takeaways"]
+    
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+    
+    def put(self, key: str, takeaways: Dict[str, Any], model_tag: str,
+            fingerprints: FrozenSet[str], scope: Optional[str] = None) -> None:
+        entry = {
+            "key": key,
+            "scope": scope,
+            "model_tag": model_tag,
+            "created_at": time.time(),
+            "takeaways": takeaways,
+            "fingerprints": fingerprints,
+        }
+        self._remember(entry)
+        
+        if self.db_path is None:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO takeaway_cache "
+                    "(key, scope, model_tag, created_at, takeaways, fingerprints) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, scope, model_tag, entry["created_at"], json.dumps(takeaways), json.dumps(sorted(fingerprints)))
+                )
+                conn.execute(
+                    "DELETE FROM takeaway_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                )
+                conn.execute(
+                    "DELETE FROM takeaway_cache WHERE key NOT IN "
+                    "(SELECT key FROM takeaway_cache ORDER BY created_at DESC LIMIT ?)", (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            # The cache is an optimisation; never fail a request over it
+            ErrorHandler.handle_data_error(e, "takeaway_cache.put")
+    
+    def _remember(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[entry["key"]] = entry
+            self._entries.move_to_end(entry["key"])
+            if entry["scope"] is not None:
+                self._latest_by_scope[(entry["scope"], entry["model_tag"])] = entry["key"]
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                scope_key = (evicted["scope"], evicted["model_tag"])
+                if self._latest_by_scope.get(scope_key) == evicted["key"]:
+                    del self._latest_by_scope[scope_key]
+    
+    def _get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._fresh(entry):
+                    self._entries.move_to_end(key)
+                    return entry
+                del self._entries[key]
+        return self._load("key = ?", (key,))
+    
+    def _load_latest(self, scope: str, model_tag: str) -> Optional[Dict[str, Any]]:
+        return self._load("scope = ? AND model_tag = ? ORDER BY created_at DESC LIMIT 1", (scope, model_tag))
+    
+    def _load(self, where: str, params: tuple) -> Optional[Dict[str, Any]]:
+        if self.db_path is None:
+            return None
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    f"SELECT key, scope, model_tag, created_at, takeaways, fingerprints FROM takeaway_cache WHERE {where}",
+                    params
+                ).fetchone()
+        except sqlite3.Error as e:
+            ErrorHandler.handle_data_error(e, "takeaway_cache.load")
+            return None
+        if row is None:
+            return None
+        
+        key, scope, model_tag, created_at, takeaways, fingerprints = row
+        entry = {
+            "key": key,
+            "scope": scope,
+            "model_tag": model_tag,
+            "created_at": created_at,
+            "takeaways": json.loads(takeaways),
+            "fingerprints": frozenset(json.loads(fingerprints)),
+        }
+        if not self._fresh(entry):
+            return None
+        self._remember(entry)
+        return entry
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self.db_path is not None,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0
+            }
+
+
+takeaway_cache = TakeawayCache(
+    config.takeaway_cache_size,
+    config.takeaway_cache_ttl,
+    data_paths.get_takeaway_cache_file() if config.takeaway_cache_persist else None
+)
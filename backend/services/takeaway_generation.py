@@ -1,41 +1,300 @@
+import asyncio
 import os
-import google.generativeai as genai
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import re
+from services.metrics import CACHE_EVENTS, EXTERNAL_ERRORS, EXTERNAL_SECONDS, timed
+from services.takeaway_cache import comment_fingerprints, takeaway_cache
+from utils import config, logger
 
 load_dotenv()
 
-def get_gemini_model(api_key: str = None):
-    """Initialize Gemini model with provided API key or environment variable."""
+GEMINI_MODEL_NAME = "gemini-2.5-flash-lite"
+# Bump whenever the prompt text or output parsing changes to invalidate cached takeaways
+PROMPT_VERSION = "2"
+# Rough chars-per-token ratio for English social media text
+CHARS_PER_TOKEN = 4
+# A single comment never takes more than this much of a prompt
+MAX_COMMENT_CHARS = 1000
+
+
+class _KeyLimiter:
+    """Per-key concurrency cap plus an even request spacing when a rate limit is set."""
+    
+    def __init__(self, max_concurrency: int, requests_per_minute: int):
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._interval = 60 / requests_per_minute if requests_per_minute > 0 else 0
+        self._next_slot = 0.0
+    
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self._interval:
+            # Only the event loop thread touches _next_slot, so no lock is needed
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+    
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+
+class GeminiClient:
+    """
+    Gemini access bound to one API key.
+    
+    Requests run as async `generate_content` calls on the registry's event
+    loop; `generate_content` is the blocking entry point for worker threads
+    and returns the SDK response (with `.text`).
+    """
+    
+    def __init__(self, api_key: str, loop: asyncio.AbstractEventLoop, max_concurrency: int, requests_per_minute: int):
+        from google import genai
+        self._client = genai.Client(api_key=api_key)
+        self._loop = loop
+        self._limiter = _KeyLimiter(max_concurrency, requests_per_minute)
+    
+    async def generate(self, prompt: str):
+        async with self._limiter:
+            start = time.perf_counter()
+            try:
+                return await self._client.aio.models.generate_content(model=GEMINI_MODEL_NAME, contents=prompt)
+            except Exception as e:
+                EXTERNAL_ERRORS.labels("gemini", type(e).__name__).inc()
+                raise
+            finally:
+                EXTERNAL_SECONDS.labels("gemini", GEMINI_MODEL_NAME).observe(time.perf_counter() - start)
+    
+    def generate_content(self, prompt: str):
+        return asyncio.run_coroutine_threadsafe(self.generate(prompt), self._loop).result()
+
+
+class GeminiClientRegistry:
+    """
+    One client per API key, so concurrent requests with different keys never
+    share credentials and each key reuses its own HTTP connections.
+    
+    All clients share a background event loop. The least recently used
+    client is dropped once more than `max_clients` keys have been seen.
+    """
+    
+    def __init__(self, max_clients: int, max_concurrency: int, requests_per_minute: int):
+        self.max_clients = max_clients
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self._clients: "OrderedDict[str, GeminiClient]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop = None
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="gemini-client-loop", daemon=True).start()
+        return self._loop
+    
+    def get(self, api_key: str) -> GeminiClient:
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = GeminiClient(api_key, self._ensure_loop(), self.max_concurrency, self.requests_per_minute)
+                self._clients[api_key] = client
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(api_key)
+            return client
+
+
+gemini_clients = GeminiClientRegistry(config.gemini_max_clients, config.gemini_max_concurrency, config.gemini_rpm)
+
+
+def get_gemini_client(api_key: str = None) -> GeminiClient:
+    """Shared Gemini client for the provided API key or the environment's."""
     key = api_key or os.getenv("GEMINI_API_KEY")
     if not key:
         raise ValueError("Gemini API key is required")
-    genai.configure(api_key=key)
-    return genai.GenerativeModel("gemini-2.5-flash-lite")
-
+    return gemini_clients.get(key)
 
 
-def extract_combined_takeaways(positive_comments: list[str], negative_comments: list[str], api_key: str = None) -> dict:
+def extract_combined_takeaways(positive_comments: list[str], negative_comments: list[str], api_key: str = None,
+                               scope: str = None, model=None) -> dict:
     """
-    Generate takeaways for both positive and negative comments in a single call.
+    Generate takeaways for both positive and negative comments.
+    
+    Every comment is taken into account: with TAKEAWAY_SAMPLE_SIZE the
+    prompt gets representative comments covering every theme, sets that fit
+    the token budget go to Gemini in a single call, larger ones are
+    summarised map-reduce style (see _condense).
+    
+    Results are cached by the full comment lists, before any sampling. With
+    a `scope` (e.g. the post id), the scope's previous takeaways are reused
+    when fewer than TAKEAWAY_REUSE_THRESHOLD percent of the comments changed.
+    
+    `model` overrides the Gemini client; anything with a
+    `generate_content(prompt)` returning an object with `.text` works.
     """
     if not positive_comments and not negative_comments:
         return {"positive": [], "negative": []}
 
-    # Get the Gemini model with the provided API key
-    model = get_gemini_model(api_key)
+    # The sample size changes the prompt, so it is part of the cache identity
+    model_tag = f"{GEMINI_MODEL_NAME}:v{PROMPT_VERSION}:s{config.takeaway_sample_size}"
+    cache_key = takeaway_cache.make_key(positive_comments, negative_comments, model_tag)
+    cached = takeaway_cache.get(cache_key)
+    if cached is not None:
+        CACHE_EVENTS.labels("takeaway", "hit").inc()
+        return cached
+
+    fingerprints = comment_fingerprints(positive_comments, negative_comments)
+    if scope:
+        similar = takeaway_cache.find_similar(
+            scope, model_tag, fingerprints, config.takeaway_reuse_threshold / 100
+        )
+        if similar is not None:
+            logger.info(f"Reusing takeaways for {scope}: comment set nearly unchanged")
+            CACHE_EVENTS.labels("takeaway", "near_hit").inc()
+            return similar
+    takeaway_cache.record_miss()
+    CACHE_EVENTS.labels("takeaway", "miss").inc()
+
+    # Get the Gemini client for the provided API key
+    model = model or get_gemini_client(api_key)
+    takeaways = _generate_takeaways(positive_comments, negative_comments, model)
+    takeaway_cache.put(cache_key, takeaways, model_tag, fingerprints, scope=scope)
+    return takeaways
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _as_bullets(lines: list[str]) -> str:
+    return "\n".join(f"- {line[:MAX_COMMENT_CHARS]}" for line in lines)
+
+
+def _bullet_tokens(lines: list[str]) -> int:
+    return sum(_estimate_tokens(line[:MAX_COMMENT_CHARS]) + 1 for line in lines)
+
 
-    # Limit comment count to maintain focus and speed
-    pos_text = "\n".join(f"- {c}" for c in positive_comments[:40])
-    neg_text = "\n".join(f"- {c}" for c in negative_comments[:40])
+def _chunk_by_budget(lines: list[str], token_budget: int) -> list[list[str]]:
+    """Split lines into consecutive chunks whose bullet text fits the budget."""
+    chunks, current, used = [], [], 0
+    for line in lines:
+        cost = _estimate_tokens(line[:MAX_COMMENT_CHARS]) + 1
+        if current and used + cost > token_budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _summarise_chunk(model, sentiment: str, lines: list[str]) -> list[str]:
+    """Map step: condense one chunk into recurring themes with rough counts."""
+    prompt = f"""
+    Summarise the recurring themes in these {sentiment} social media comments.
+
+    COMMENTS:
+    {_as_bullets(lines)}
+
+    Format:
+    - One theme per line, starting with "- ".
+    - End each line with the approximate number of comments it covers, e.g. "- Fast delivery praised (~12)".
+    - At most 10 lines.
+
+    Rules:
+    - NO preamble or intro/outro.
+    - Use neutral, professional language.
+    """
+    text = model.generate_content(prompt).text
+    return [line.strip().lstrip("-*• ").strip() for line in text.splitlines() if line.strip().startswith(("-", "*", "•"))]
+
+
+def _condense(model, executor: ThreadPoolExecutor, groups: dict[str, list[str]], token_budget: int) -> dict[str, list[str]]:
+    """
+    Reduce every comment group until it fits in `token_budget`.
+    
+    Each round splits the oversized groups into chunks of up to
+    TAKEAWAY_CHUNK_TOKENS and summarises all of them concurrently. Summaries
+    that are still too long are summarised again, so wall-clock time grows
+    with comments / (chunk size x parallelism) plus a logarithmic number
+    of reduce rounds.
+    """
+    groups = dict(groups)
+    sizes = {sentiment: _bullet_tokens(lines) for sentiment, lines in groups.items()}
+    chunk_budget = max(token_budget, config.takeaway_chunk_tokens)
+
+    while True:
+        oversized = [sentiment for sentiment, size in sizes.items() if size > token_budget]
+        if not oversized:
+            return groups
+
+        tasks = [
+            (sentiment, chunk)
+            for sentiment in oversized
+            for chunk in _chunk_by_budget(groups[sentiment], chunk_budget)
+        ]
+        summaries = list(executor.map(lambda task: _summarise_chunk(model, *task), tasks))
+
+        for sentiment in oversized:
+            condensed = [
+                theme for (task_sentiment, _), summary in zip(tasks, summaries)
+                if task_sentiment == sentiment for theme in summary
+            ]
+            condensed_size = _bullet_tokens(condensed)
+            if not condensed or condensed_size >= sizes[sentiment]:
+                # The model is not shrinking the input; cut instead of looping
+                condensed = _chunk_by_budget(groups[sentiment], token_budget)[0]
+                condensed_size = _bullet_tokens(condensed)
+            groups[sentiment], sizes[sentiment] = condensed, condensed_size
+
+
+def _sample(positive_comments: list[str], negative_comments: list[str]) -> tuple[list[str], list[str]]:
+    """Representative comments per sentiment, so near-duplicates do not crowd out other themes."""
+    if config.takeaway_sample_size <= 0:
+        return positive_comments, negative_comments
+    from services.comment_sampler import sample_representatives
+    with timed("sampling"):
+        return (
+            sample_representatives(positive_comments, config.takeaway_sample_size),
+            sample_representatives(negative_comments, config.takeaway_sample_size),
+        )
+
+
+def _generate_takeaways(positive_comments: list[str], negative_comments: list[str], model) -> dict:
+    positive_comments, negative_comments = _sample(positive_comments, negative_comments)
+    budget = config.takeaway_token_budget
+    pos_lines, neg_lines = positive_comments, negative_comments
+    source_note = "COMMENTS"
+
+    if _bullet_tokens(positive_comments) + _bullet_tokens(negative_comments) > budget:
+        # Each group gets half of the final prompt's budget
+        with timed("takeaways_condense"), ThreadPoolExecutor(max_workers=config.takeaway_parallelism) as executor:
+            condensed = _condense(
+                model, executor, {"positive": positive_comments, "negative": negative_comments}, budget // 2
+            )
+        pos_lines, neg_lines = condensed["positive"], condensed["negative"]
+        source_note = "COMMENT THEMES (summarised from all comments, approximate counts in parentheses)"
+        logger.info(
+            f"Condensed {len(positive_comments)}+{len(negative_comments)} comments "
+            f"into {len(pos_lines)}+{len(neg_lines)} themes"
+        )
+
+    pos_text = _as_bullets(pos_lines)
+    neg_text = _as_bullets(neg_lines)
 
     prompt = f"""
     Analyze these social media comments and provide insights.
 
-    POSITIVE COMMENTS:
+    POSITIVE {source_note}:
     {pos_text if pos_text else "None"}
 
-    NEGATIVE COMMENTS:
+    NEGATIVE {source_note}:
     {neg_text if neg_text else "None"}
 
     Task:
@@ -66,7 +325,8 @@ def extract_combined_takeaways(positive_comments: list[str], negative_comments:
     - Use neutral, professional language.
     """
 
-    response = model.generate_content(prompt)
+    with timed("takeaways_prompt"):
+        response = model.generate_content(prompt)
     text = response.text
 
     def extract_section(start_tag, end_tag):
@@ -81,4 +341,3 @@ def extract_combined_takeaways(positive_comments: list[str], negative_comments:
         "positive": extract_section("[POSITIVE_START]", "[POSITIVE_END]"),
         "negative": extract_section("[NEGATIVE_START]", "[NEGATIVE_END]")
     }
-
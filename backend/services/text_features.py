@@ -0,0 +1,51 @@
+"""Fast, model-free text vectors for clustering and lightweight classifiers."""
+import re
+import zlib
+from typing import List, Tuple
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def _tokens(text: str) -> List[str]:
+    """Lower-cased words and symbols (each emoji is its own token) plus word bigrams."""
+    words = _WORD_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hashed_sparse(
+    texts: List[str], n_features: int = 512, max_chars: int = 120
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    L2-normalised hashed bag of words and word bigrams as COO triplets.
+    
+    Returns (rows, cols, values) sorted by row then column. CRC32 is used
+    instead of `hash()` so features are identical across processes.
+    Comments are cut to `max_chars` so one wall of text cannot dominate the
+    runtime.
+    """
+    token_lists = [_tokens(text[:max_chars]) for text in texts]
+    # Comments share most of their tokens, so hash each distinct token once
+    vocabulary = {token for tokens in token_lists for token in tokens}
+    bucket_of = {token: zlib.crc32(token.encode("utf-8")) % n_features for token in vocabulary}
+    
+    rows = np.repeat(np.arange(len(texts), dtype=np.int64), [len(tokens) for tokens in token_lists])
+    cols = np.fromiter(
+        (bucket_of[token] for tokens in token_lists for token in tokens), dtype=np.int64, count=len(rows)
+    )
+    
+    cells, counts = np.unique(rows * n_features + cols, return_counts=True)
+    rows, cols = cells // n_features, cells % n_features
+    # Sub-linear term frequency keeps repeated characters ("!!!!!!") in check
+    values = np.log1p(counts).astype(np.float32)
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(texts)))
+    norms[norms == 0] = 1.0
+    return rows, cols, (values / norms[rows]).astype(np.float32)
+
+
+def hashed_features(texts: List[str], n_features: int = 512, max_chars: int = 120) -> np.ndarray:
+    """Dense form of hashed_sparse, for small feature spaces such as clustering."""
+    rows, cols, values = hashed_sparse(texts, n_features, max_chars)
+    matrix = np.zeros((len(texts), n_features), dtype=np.float32)
+    matrix[rows, cols] = values
+    return matrix
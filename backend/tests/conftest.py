@@ -0,0 +1,10 @@
+"""Tests import the backend the way the app runs: from the backend directory, with its own data dir."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Config and the SQLite stores read the environment at import time
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="sie-tests-")
+os.environ.setdefault("PRELOAD_MODEL", "false")
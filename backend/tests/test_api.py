@@ -0,0 +1,20 @@
+from fastapi.testclient import TestClient
+import main
+
+
+def test_ready_without_preload_reports_lazy_model():
+    # conftest disables PRELOAD_MODEL, so nothing loads the model at startup
+    response = TestClient(main.app).get("/ready")
+    assert response.status_code == 200
+    assert response.json()["sentimentModel"]["status"] == "lazy"
+
+
+def test_cache_stats_report_request_coalescing(monkeypatch):
+    import controllers.classify as classify
+    from services.micro_batcher import MicroBatcher
+
+    batcher = MicroBatcher(lambda texts: [{"label": "neutral", "score": 1.0}] * len(texts), max_wait_ms=0)
+    monkeypatch.setattr(classify, "_sentiment_engine", batcher)
+    batcher.classify(["a", "b"])
+    batching = TestClient(main.app).get("/cache/stats").json()["batching"]
+    assert batching == {"requests": 1, "batches": 1, "requests_per_batch": 1.0}
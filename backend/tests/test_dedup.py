@@ -0,0 +1,29 @@
+from services.dedup import MinHashLSH
+
+
+def test_opposite_sentiment_is_never_grouped():
+    texts = [
+        "This is the best pizza place in town, we went there last night with the whole family",
+        "This is the worst pizza place in town, we went there last night with the whole family",
+        "I love the new update, the app feels much faster now",
+        "I hate the new update, the app feels much faster now",
+        "Great service 😍",
+        "Great service 😡",
+        "10/10 would order again",
+        "0/10 would order again",
+    ]
+    assert MinHashLSH().group(texts, 20) == list(range(len(texts)))
+
+
+def test_mentions_punctuation_and_repeated_emoji_are_grouped():
+    texts = [
+        "@anna Love this!!! ❤️",
+        "@ben love this ❤️❤️",
+        "Love   this... ❤️",
+        "Love this",
+    ]
+    assert MinHashLSH().group(texts, 20) == [0, 0, 0, 3]
+
+
+def test_wordless_texts_only_match_exactly():
+    assert MinHashLSH().group(["!!!", "...", "!!!"], 20) == [0, 1, 0]
@@ -0,0 +1,58 @@
+import time
+import pytest
+import requests
+from benchmarks.mock_services import MockGraphAPI
+from services.comment_store import comment_store
+from services.facebook_service import FacebookService
+from services.graph_client import graph_client
+from utils import config
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    api = MockGraphAPI("page", {
+        "paged": [f"comment {i}" for i in range(250)],
+        "growing": [f"comment {i}" for i in range(120)],
+    }).start()
+    monkeypatch.setattr(config, "fb_graph_url", api.url)
+    yield api
+    api.stop()
+
+
+def test_throttled_requests_wait_for_retry_after(graph):
+    graph.throttle(2, retry_after=0.2)
+    start = time.perf_counter()
+    response = graph_client.get(f"{graph.url}/v/page_paged/comments", params={"limit": 10})
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 10
+    assert time.perf_counter() - start >= 0.4
+    assert graph.requests == 3
+
+
+def test_throttling_past_max_retries_surfaces_the_429(graph, monkeypatch):
+    monkeypatch.setattr(graph_client, "max_retries", 1)
+    graph.throttle(5)
+    with pytest.raises(requests.exceptions.HTTPError):
+        list(FacebookService("page", "token").iter_comment_pages("paged", prefetch=0))
+    assert graph.requests == 2
+
+
+def test_pages_follow_the_cursor_until_the_last_page(graph):
+    pages = list(FacebookService("page", "token").iter_comment_pages("paged", page_size=100))
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert [c["id"] for page in pages for c in page] == [f"paged_{i}" for i in range(250)]
+    assert graph.requests == 3
+
+
+def test_incremental_scrape_fetches_only_comments_since_the_watermark(graph):
+    service = FacebookService("page", "token")
+    assert service.scrape_comments("growing") == 120
+    comment_store.save_labels("growing", [("growing_0", "positive")])
+
+    graph.add_comments("growing", 3)
+    before = graph.requests
+    assert service.scrape_comments("growing", incremental=True) == 3
+    # Newest first from the watermark: one page, and earlier labels are kept
+    assert graph.requests - before == 1
+    assert comment_store.count_comments("growing") == 123
+    assert comment_store.get_counts("growing")["positive"] == 1
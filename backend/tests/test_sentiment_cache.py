@@ -0,0 +1,30 @@
+import sqlite3
+from services.sentiment_cache import SentimentCache
+
+
+def _results(n):
+    return [{"label": "neutral", "score": 0.5}] * n
+
+
+def test_persistent_tier_keeps_the_newest_rows_up_to_the_cap(tmp_path):
+    db_path = tmp_path / "sentiment_cache.db"
+    cache = SentimentCache(10, db_path, max_rows=1500)
+    for start in range(0, 3000, 500):
+        texts = [f"comment {i}" for i in range(start, start + 500)]
+        cache.store(texts, _results(500), "model")
+
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+    # Checked every 1000 stored rows, so at most that many past the cap
+    assert 1500 <= rows < 2500
+    fresh = SentimentCache(10, db_path, max_rows=1500)
+    assert fresh.lookup(["comment 2999"], "model")[0] is not None
+    assert fresh.lookup(["comment 0"], "model")[0] is None
+
+
+def test_opening_the_cache_prunes_to_the_cap(tmp_path):
+    db_path = tmp_path / "sentiment_cache.db"
+    SentimentCache(10, db_path).store([f"comment {i}" for i in range(300)], _results(300), "model")
+    cache = SentimentCache(10, db_path, max_rows=100)
+    assert cache.stats()["pruned"] == 200
+    assert cache.lookup(["comment 299", "comment 199"], "model")[1] is None
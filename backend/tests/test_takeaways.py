@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.mock_services import MockGemini, MockGeminiResponse
+from controllers.classify import _build_result, add_takeaways
+from services.takeaway_generation import _bullet_tokens, _chunk_by_budget, _condense
+from utils import config
+
+
+def _result(positive, negative):
+    counts = {"positive": len(positive), "neutral": 0, "negative": len(negative)}
+    return _build_result(counts, {"positive": positive, "neutral": [], "negative": negative})
+
+
+def _positive(duplicates: int):
+    return ["Great service"] * duplicates + [f"Fast delivery to town {i}" for i in range(40)]
+
+
+def test_reuse_check_sees_every_comment_not_the_sample(monkeypatch):
+    monkeypatch.setattr(config, "takeaway_sample_size", 5)
+    model = MockGemini(latency_ms=0)
+
+    add_takeaways(_result(_positive(12), ["Slow refund"]), post_id="reuse-post", model=model)
+    # One more copy of a duplicate changes the sample's "(×N similar)" note, not the comment set
+    add_takeaways(_result(_positive(13), ["Slow refund"]), post_id="reuse-post", model=model)
+    assert model.calls == 1
+
+    changed = _positive(13) + [f"New theme {i}" for i in range(5)]
+    add_takeaways(_result(changed, ["Slow refund"]), post_id="reuse-post", model=model)
+    assert model.calls == 2
+
+
+def test_prompt_is_built_from_the_sample(monkeypatch):
+    monkeypatch.setattr(config, "takeaway_sample_size", 5)
+    prompts = []
+
+    class RecordingGemini(MockGemini):
+        def generate_content(self, prompt):
+            prompts.append(prompt)
+            return super().generate_content(prompt)
+
+    add_takeaways(_result(_positive(12), ["Rude staff"]), post_id="sample-post", model=RecordingGemini(latency_ms=0))
+    positive_lines = [line for line in prompts[0].splitlines() if "Great service" in line or "Fast delivery" in line]
+    assert len(positive_lines) <= 5
+    assert any("similar)" in line for line in positive_lines)
+
+
+def _comments(n: int):
+    return [f"Comment number {i} about delivery speed and packaging" for i in range(n)]
+
+
+def test_condense_chunks_and_reduces_until_the_budget_fits(monkeypatch):
+    monkeypatch.setattr(config, "takeaway_chunk_tokens", 100)
+    lines = _comments(100)
+    first_round = len(_chunk_by_budget(lines, 100))
+    model = MockGemini(latency_ms=0)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        condensed = _condense(model, executor, {"positive": lines, "negative": ["Slow refund"]}, 50)
+
+    assert _bullet_tokens(condensed["positive"]) <= 50
+    assert condensed["negative"] == ["Slow refund"]
+    # Round one summarises every chunk; the summaries are still too long, so further rounds reduce them
+    assert first_round > 1
+    assert model.calls > first_round
+
+
+def test_condense_cuts_when_the_model_does_not_shrink_its_input(monkeypatch):
+    monkeypatch.setattr(config, "takeaway_chunk_tokens", 100)
+
+    class EchoModel:
+        calls = 0
+
+        def generate_content(self, prompt):
+            self.calls += 1
+            return MockGeminiResponse(prompt)
+
+    model = EchoModel()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        condensed = _condense(model, executor, {"positive": _comments(40), "negative": []}, 50)
+
+    assert _bullet_tokens(condensed["positive"]) <= 50
+    assert condensed["positive"] == _comments(40)[:len(condensed["positive"])]
+    assert model.calls == len(_chunk_by_budget(_comments(40), 100))
@@ -3,11 +3,13 @@ Common utilities and configurations for the Social Insight Engine backend.
 """
 import os
 import logging
-import pandas as pd
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,6 +21,51 @@ class Config:
         self.fb_access_token = os.getenv("FB_ACCESS_TOKEN")
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         self.fb_api_version = os.getenv("FB_API_VERSION", "v24.0")
+        self.fb_graph_url = os.getenv("FB_GRAPH_URL", "https://graph.facebook.com").rstrip("/")
+        self.graph_pool_size = int(os.getenv("GRAPH_POOL_SIZE", "20"))
+        self.graph_max_retries = int(os.getenv("GRAPH_MAX_RETRIES", "3"))
+        self.graph_timeout = float(os.getenv("GRAPH_TIMEOUT", "10"))
+        self.graph_backoff_base = float(os.getenv("GRAPH_BACKOFF_BASE", "0.5"))
+        self.graph_backoff_max = float(os.getenv("GRAPH_BACKOFF_MAX", "30"))
+        self.max_comments = int(os.getenv("MAX_COMMENTS", "0"))
+        self.sentiment_backend = os.getenv("SENTIMENT_BACKEND", "torch").lower()
+        self.sentiment_batch_size = int(os.getenv("SENTIMENT_BATCH_SIZE", "32"))
+        self.sentiment_max_length = int(os.getenv("SENTIMENT_MAX_LENGTH", "128"))
+        self.inference_threads = int(os.getenv("INFERENCE_THREADS", "0"))
+        self.dedup_threshold = float(os.getenv("DEDUP_THRESHOLD", "1.0"))
+        self.dedup_min_chars = int(os.getenv("DEDUP_MIN_CHARS", "20"))
+        self.cascade_model = os.getenv("CASCADE_MODEL", "")
+        self.cascade_threshold = float(os.getenv("CASCADE_THRESHOLD", "0.9"))
+        self.cascade_audit_rate = float(os.getenv("CASCADE_AUDIT_RATE", "0.02"))
+        self.inference_workers = int(os.getenv("INFERENCE_WORKERS", "0"))
+        self.inference_worker_threads = int(os.getenv("INFERENCE_WORKER_THREADS", "0"))
+        self.inference_batch_window_ms = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5"))
+        self.inference_max_batch = int(os.getenv("INFERENCE_MAX_BATCH", "256"))
+        self.sentiment_cache_size = int(os.getenv("SENTIMENT_CACHE_SIZE", "50000"))
+        self.sentiment_cache_persist = os.getenv("SENTIMENT_CACHE_PERSIST", "true").lower() == "true"
+        self.sentiment_cache_max_rows = int(os.getenv("SENTIMENT_CACHE_MAX_ROWS", "1000000"))
+        self.gemini_max_clients = int(os.getenv("GEMINI_MAX_CLIENTS", "64"))
+        self.gemini_max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+        self.gemini_rpm = int(os.getenv("GEMINI_RPM", "0"))
+        self.posts_cache_size = int(os.getenv("POSTS_CACHE_SIZE", "256"))
+        self.posts_cache_ttl = float(os.getenv("POSTS_CACHE_TTL", "60"))
+        self.posts_cache_stale = float(os.getenv("POSTS_CACHE_STALE", "600"))
+        self.takeaway_cache_size = int(os.getenv("TAKEAWAY_CACHE_SIZE", "1000"))
+        self.takeaway_cache_ttl = int(os.getenv("TAKEAWAY_CACHE_TTL", "86400"))
+        self.takeaway_cache_persist = os.getenv("TAKEAWAY_CACHE_PERSIST", "true").lower() == "true"
+        self.takeaway_reuse_threshold = float(os.getenv("TAKEAWAY_REUSE_THRESHOLD", "5"))
+        self.takeaway_sample_size = int(os.getenv("TAKEAWAY_SAMPLE_SIZE", "200"))
+        self.takeaway_token_budget = int(os.getenv("TAKEAWAY_TOKEN_BUDGET", "8000"))
+        self.takeaway_chunk_tokens = int(os.getenv("TAKEAWAY_CHUNK_TOKENS", "32000"))
+        self.takeaway_parallelism = int(os.getenv("TAKEAWAY_PARALLELISM", "4"))
+        self.classify_stream_chunk = int(os.getenv("CLASSIFY_STREAM_CHUNK", "256"))
+        self.preload_model = os.getenv("PRELOAD_MODEL", "true").lower() == "true"
+        self.job_workers = int(os.getenv("JOB_WORKERS", "4"))
+        self.job_queue_size = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+        self.job_ttl_seconds = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+        self.job_fetch_concurrency = int(os.getenv("JOB_FETCH_CONCURRENCY", "4"))
+        self.job_classify_concurrency = int(os.getenv("JOB_CLASSIFY_CONCURRENCY", "1"))
+        self.job_takeaway_concurrency = int(os.getenv("JOB_TAKEAWAY_CONCURRENCY", "4"))
     
     def validate_fb_credentials(self) -> tuple[str, str]:
         if not self.fb_page_id or not self.fb_access_token:
@@ -34,11 +81,26 @@ class DataPaths:
     
     def __init__(self):
         self.backend_dir = Path(__file__).parent
-        self.data_dir = self.backend_dir / "data"
-        self.data_dir.mkdir(exist_ok=True)
+        self.data_dir = Path(os.getenv("DATA_DIR", self.backend_dir / "data"))
+        self.data_dir.mkdir(parents=True, exist_ok=True)
     
-    def get_comments_file(self) -> Path:
+    def get_comments_file(self, post_id: Optional[str] = None) -> Path:
+        """Excel export path; the comment store is the source of truth."""
+        if post_id:
+            return self.data_dir / f"comment_{post_id}.xlsx"
         return self.data_dir / "comment.xlsx"
+    
+    def get_comment_store_file(self) -> Path:
+        return self.data_dir / "comments.db"
+    
+    def get_onnx_model_dir(self, model_name: str) -> Path:
+        return self.data_dir / "onnx" / model_name.replace("/", "--")
+    
+    def get_sentiment_cache_file(self) -> Path:
+        return self.data_dir / "sentiment_cache.db"
+    
+    def get_takeaway_cache_file(self) -> Path:
+        return self.data_dir / "takeaway_cache.db"
 
 class ErrorHandler:
     
@@ -55,12 +117,14 @@ class ErrorHandler:
         logger.error(f"File error in {operation}: {e}", exc_info=True)
 
 class DataFrameOperations:
+    """pandas is imported on first use so processes that never touch a DataFrame skip it."""
     
     @staticmethod
     def save_comments_to_excel(comments: list[dict[str, str]], file_path: Path) -> int:
         if not comments:
             return 0
         
+        import pandas as pd
         try:
             df = pd.DataFrame(comments)
             df.to_excel(file_path, index=False)
@@ -71,7 +135,8 @@ class DataFrameOperations:
             raise
     
     @staticmethod
-    def load_comments_from_excel(file_path: Path) -> pd.DataFrame:
+    def load_comments_from_excel(file_path: Path) -> "pd.DataFrame":
+        import pandas as pd
         if not file_path.exists():
             return pd.DataFrame()
         
@@ -87,13 +152,14 @@ class FacebookAPIClient:
         self.page_id = page_id
         self.access_token = access_token
         self.api_version = api_version
-        self.base_url = f"https://graph.facebook.com/{api_version}"
+        self.base_url = f"{config.fb_graph_url}/{api_version}"
     
     def build_url(self, endpoint: str) -> str:
         return f"{self.base_url}/{endpoint}"
     
     def get_posts(self, limit: int = 20) -> Dict[str, Any]:
         import requests
+        from services.graph_client import graph_client
         
         url = self.build_url(f"{self.page_id}/posts")
         params = {
@@ -103,7 +169,7 @@ class FacebookAPIClient:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = graph_client.get(url, params=params, operation="get_posts")
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -112,6 +178,7 @@ class FacebookAPIClient:
     
     def get_post_comments(self, post_id: str, limit: int = 100) -> Dict[str, Any]:
         import requests
+        from services.graph_client import graph_client
         
         url = self.build_url(f"{self.page_id}_{post_id}")
         params = {
@@ -120,7 +187,7 @@ class FacebookAPIClient:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = graph_client.get(url, params=params, operation="get_post_comments")
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
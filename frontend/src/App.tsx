@@ -1,4 +1,4 @@
-import { useMemo, useState, useEffect } from 'react'
+import { useMemo, useState, useEffect, useRef } from 'react'
 import { fetchSentimentByPostId, fetchPosts, type Credentials } from './services/sentimentService'
 import type { SentimentSummary } from './types'
 import { useTheme } from './services/themeService'
@@ -57,6 +57,10 @@ function App() {
   const [postsError, setPostsError] = useState<string | null>(null)
   const [showPostsDropdown, setShowPostsDropdown] = useState(false)
 
+  // Aborts the running analysis poll on a new search or unmount
+  const searchAbort = useRef<AbortController | null>(null)
+  useEffect(() => () => searchAbort.current?.abort(), [])
+
   // Load credentials from localStorage on mount
   useEffect(() => {
     const saved = localStorage.getItem('social_insight_credentials')
@@ -123,8 +127,12 @@ function App() {
        }
     }
 
+    searchAbort.current?.abort()
+    const controller = new AbortController()
+    searchAbort.current = controller
+
     try {
-      const res = await fetchSentimentByPostId(postId.trim(), credentials)
+      const res = await fetchSentimentByPostId(postId.trim(), credentials, { signal: controller.signal })
       setData(res)
       const newHistoryItem = { postId: postId.trim(), timestamp: Date.now(), summary: res }
       setHistory(prev => {
@@ -135,9 +143,13 @@ function App() {
       setShowHistory(false)
       setShowPostsDropdown(false)
     } catch (e: any) {
+      if (controller.signal.aborted) return
       setError(e?.message || 'Failed to fetch sentiment')
     } finally {
-      setLoading(false)
+      if (searchAbort.current === controller) {
+        searchAbort.current = null
+        setLoading(false)
+      }
     }
   }
 
@@ -1,5 +1,9 @@
 import type { SentimentSummary } from "../types";
 
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_MAX_INTERVAL_MS = 5000;
+const JOB_MAX_WAIT_MS = 5 * 60 * 1000;
+
 export interface Credentials {
   pageId: string
   accessToken: string
@@ -22,9 +26,33 @@ export async function fetchPosts(credentials: Omit<Credentials, 'geminiApiKey'>)
   return res.json();
 }
 
+export interface JobWaitOptions {
+  signal?: AbortSignal
+  maxWaitMs?: number
+}
+
+function sleep(ms: number, signal?: AbortSignal): Promise<void> {
+  return new Promise((resolve, reject) => {
+    if (signal?.aborted) {
+      reject(signal.reason);
+      return;
+    }
+    const timer = setTimeout(() => {
+      signal?.removeEventListener("abort", onAbort);
+      resolve();
+    }, ms);
+    function onAbort() {
+      clearTimeout(timer);
+      reject(signal!.reason);
+    }
+    signal?.addEventListener("abort", onAbort, { once: true });
+  });
+}
+
 export async function fetchSentimentByPostId(
   postId: string,
-  credentials: Credentials
+  credentials: Credentials,
+  { signal, maxWaitMs = JOB_MAX_WAIT_MS }: JobWaitOptions = {}
 ): Promise<SentimentSummary> {
   const headers: Record<string, string> = {
     "Content-Type": "application/json",
@@ -36,24 +64,46 @@ export async function fetchSentimentByPostId(
   if (credentials.accessToken) {
     headers["X-FB-Access-Token"] = credentials.accessToken;
   }
+  if (credentials.geminiApiKey) {
+    headers["X-Gemini-Api-Key"] = credentials.geminiApiKey;
+  }
 
-  // 1) Trigger scraping for this post
-  const scrapeRes = await fetch("http://localhost:8000/scrape", {
+  // 1) Queue scrape + classify + takeaways as a background job
+  const submitRes = await fetch("http://localhost:8000/jobs", {
     method: "POST",
     headers,
     body: JSON.stringify({ post_id: postId }),
+    signal,
   });
 
-  if (!scrapeRes.ok) {
-    throw new Error("Failed to scrape comments for this post");
+  if (!submitRes.ok) {
+    throw new Error("Failed to start analysis for this post");
   }
 
-  // 2) After scraping completes, fetch classification
-  const res = await fetch(`http://localhost:8000/classify?post_id=${encodeURIComponent(postId)}`);
+  const { jobId } = await submitRes.json();
 
-  if (!res.ok) {
-    throw new Error("Failed to fetch sentiment");
-  }
+  // 2) Poll the job until it finishes, backing off, until the deadline or the caller aborts
+  const deadline = Date.now() + maxWaitMs;
+  let interval = JOB_POLL_INTERVAL_MS;
+  while (true) {
+    const remaining = deadline - Date.now();
+    if (remaining <= 0) {
+      throw new Error("Analysis is taking too long. Please try again later.");
+    }
+    await sleep(Math.min(interval, remaining), signal);
+    interval = Math.min(interval * 1.5, JOB_POLL_MAX_INTERVAL_MS);
 
-  return res.json();
+    const res = await fetch(`http://localhost:8000/jobs/${encodeURIComponent(jobId)}`, { signal });
+    if (!res.ok) {
+      throw new Error("Failed to fetch sentiment");
+    }
+
+    const job = await res.json();
+    if (job.status === "completed") {
+      return job.result;
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Failed to fetch sentiment");
+    }
+  }
 }